@@ -0,0 +1,110 @@
+import base64
+import io
+import json
+import zipfile
+from typing import Dict, List, Optional
+
+from timetables.parser.edupage.api import FakeTransport, Session
+from timetables.parser.edupage.api.transport import Request
+
+TABLES = {
+    "periods": [
+        {"id": "1", "period": "1", "starttime": "8:00", "endtime": "8:45"},
+        {"id": "2", "period": "2", "starttime": "8:50", "endtime": "9:35"},
+    ],
+    "classes": [{"id": "*1", "name": "1A"}, {"id": "*2", "name": "1B"}],
+    "groups": [
+        {"id": "*10", "classid": "*1", "name": "Cała klasa", "entireclass": True},
+        {"id": "*11", "classid": "*2", "name": "g1", "entireclass": False},
+    ],
+    "subjects": [{"id": "*5", "name": "Math"}],
+    "teachers": [
+        {"id": "*7", "short": "JK"},
+        {"id": "*8", "firstname": "Anna", "lastname": "Nowak"},
+    ],
+    "classrooms": [{"id": "*3", "name": "101"}],
+    "lessons": [
+        {
+            "id": "*20",
+            "subjectid": "*5",
+            "classroomidss": [["*3"]],
+            "classids": ["*1"],
+            "groupids": ["*10"],
+            "teacherids": ["*7"],
+        },
+        {
+            "id": "*21",
+            "subjectid": "*5",
+            "classroomidss": [],
+            "classids": ["*2"],
+            "groupids": ["*11"],
+            "teacherids": ["*8", "*7"],
+        },
+    ],
+    "cards": [
+        {"id": "*30", "lessonid": "*20", "period": "1", "days": "10000"},
+        {"id": "*31", "lessonid": "*21", "period": "2", "days": "01000"},
+    ],
+}
+
+TEACHERS_V1 = [
+    {"id": "*7", "firstname": "Jan", "lastname": "Kowalski"},
+    {"id": "*8", "firstname": "Anna", "lastname": "Nowak"},
+]
+
+
+def session(edupage: str = "test") -> Session:
+    return Session(
+        edupage=edupage,
+        username="user",
+        password_hash="hash",
+        name_first="First",
+        name_last="Last",
+        esid="esid",
+    )
+
+
+def timetable_response(tables: Dict[str, list] = TABLES) -> dict:
+    tables = [{"id": table, "data_rows": rows} for table, rows in tables.items()]
+    data = {"": {"regularData": {"dbiAccessorRes": {"tables": tables}}}}
+    return {"status": "ok", "tables": {"Timetable": {"data": data}}}
+
+
+def timetables_v1_response(versions: List[dict]) -> dict:
+    """
+    The v1 "timetables" payload, versions being dicts with "dbi", "text"
+    and "datefrom" keys.
+    """
+    timetables = {str(i): version for i, version in enumerate(versions, 1)}
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr("timetables.json", json.dumps({"timetables": timetables}))
+    data = base64.b64encode(buffer.getvalue()).decode()
+    return {"status": "ok", "tables": {"timetables": {"data": data}}}
+
+
+class Edupage:
+    """
+    Answers v1 and v2 sync requests, counting them.
+    """
+
+    def __init__(
+        self,
+        tables: Dict[str, list] = TABLES,
+        versions: Optional[List[dict]] = None,
+    ):
+        self.tables = tables
+        self.versions = versions or [
+            {"dbi": {"teachers": TEACHERS_V1}, "text": "Current", "datefrom": None}
+        ]
+        self.calls = {"v1": 0, "v2": 0}
+
+    def __call__(self, request: Request) -> dict:
+        if "connect_mobile" in request.url:
+            self.calls["v1"] += 1
+            return timetables_v1_response(self.versions)
+        self.calls["v2"] += 1
+        return timetable_response(self.tables)
+
+    def transport(self) -> FakeTransport:
+        return FakeTransport(handler=self)
@@ -0,0 +1,94 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class RespServer:
+    """
+    A minimal in-process server speaking the Redis protocol (RESP), supporting
+    the commands used by RedisCache. Replies to commands reading keys listed
+    in `delays` are delayed by the given number of seconds.
+    """
+
+    def __init__(self, password: Optional[str] = None):
+        self.password = password
+        self.data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self.delays: Dict[str, float] = {}
+        self.connections = 0
+        self.port = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _read_command(self, reader: asyncio.StreamReader) -> List[bytes]:
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError()
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int((await reader.readline())[1:-2])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        value, expires = self.data.get(key, (None, None))
+        if expires is not None and expires < time.time():
+            return None
+        return value
+
+    @staticmethod
+    def _bulk(value: Optional[bytes]) -> bytes:
+        if value is None:
+            return b"$-1\r\n"
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    async def _reply(self, args: List[bytes], authorized: bool) -> bytes:
+        command = args[0].upper()
+        if command == b"AUTH":
+            if args[1].decode() != self.password:
+                return b"-WRONGPASS invalid password\r\n"
+            return b"+OK\r\n"
+        if not authorized:
+            return b"-NOAUTH Authentication required\r\n"
+        if command == b"SELECT":
+            return b"+OK\r\n"
+        if command == b"MGET":
+            for key in args[1:]:
+                await asyncio.sleep(self.delays.get(key.decode(), 0))
+            values = [self._bulk(self._get(key)) for key in args[1:]]
+            return b"*%d\r\n%s" % (len(values), b"".join(values))
+        if command == b"SET":
+            expires = None
+            if len(args) == 5 and args[3].upper() == b"EX":
+                expires = time.time() + int(args[4])
+            self.data[args[1]] = (args[2], expires)
+            return b"+OK\r\n"
+        if command == b"MSET":
+            for key, value in zip(args[1::2], args[2::2]):
+                self.data[key] = (value, None)
+            return b"+OK\r\n"
+        return b"-ERR unknown command\r\n"
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self.connections += 1
+        authorized = self.password is None
+        try:
+            while True:
+                args = await self._read_command(reader)
+                reply = await self._reply(args, authorized)
+                if args[0].upper() == b"AUTH" and reply.startswith(b"+"):
+                    authorized = True
+                writer.write(reply)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
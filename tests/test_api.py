@@ -0,0 +1,101 @@
+import asyncio
+import unittest
+
+from timetables.parser.edupage.api import (
+    EdupageApi,
+    FakeTransport,
+    SessionExpiredError,
+    SingleFlight,
+)
+
+from .fixtures import session, timetable_response
+
+
+class SlowTransport(FakeTransport):
+    async def post(self, url, params=None, data=None, headers=None):
+        # let concurrent calls join the same flight
+        await asyncio.sleep(0.01)
+        return await super().post(url, params, data, headers)
+
+
+def handler(request):
+    if request.params["ESID"] == "expired":
+        return {"status": "insufficient_privileges"}
+    return timetable_response()
+
+
+class SingleFlightTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.transport = SlowTransport(handler=handler)
+        self.api = EdupageApi(transport=self.transport)
+
+    async def sync(self, esid: str) -> dict:
+        s = session()
+        s.esid = esid
+        return await self.api.v2.sync(s, tables={"Timetable": [""]})
+
+    async def test_same_session_shares_request(self) -> None:
+        results = await asyncio.gather(self.sync("valid"), self.sync("valid"))
+        self.assertEqual(len(self.transport.requests), 1)
+        self.assertIs(results[0], results[1])
+
+    async def test_expired_session_is_not_shared(self) -> None:
+        expired, valid = await asyncio.gather(
+            self.sync("expired"), self.sync("valid"), return_exceptions=True
+        )
+        self.assertIsInstance(expired, SessionExpiredError)
+        self.assertIn("Timetable", valid)
+        self.assertEqual(len(self.transport.requests), 2)
+
+
+class SingleFlightCancellationTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.flights = SingleFlight()
+        self.started = 0
+        self.cancelled = 0
+
+    async def call(self) -> int:
+        self.started += 1
+        try:
+            await asyncio.sleep(0.1)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return self.started
+
+    async def test_one_waiter_cancelled(self) -> None:
+        first = asyncio.create_task(self.flights.run("key", self.call))
+        second = asyncio.create_task(self.flights.run("key", self.call))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await first
+        # the other waiter still gets the result of the same call
+        self.assertEqual(await second, 1)
+        self.assertEqual((self.started, self.cancelled), (1, 0))
+        self.assertEqual(len(self.flights), 0)
+
+    async def test_all_waiters_cancelled(self) -> None:
+        tasks = [asyncio.create_task(self.flights.run("key", self.call)) for _ in "ab"]
+        await asyncio.sleep(0.01)
+        for task in tasks:
+            task.cancel()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        self.assertTrue(all(isinstance(r, asyncio.CancelledError) for r in results))
+        await asyncio.sleep(0)
+        self.assertEqual(self.cancelled, 1)
+        self.assertEqual(len(self.flights), 0)
+        # a new caller starts a new call, instead of joining the cancelled one
+        self.assertEqual(await self.flights.run("key", self.call), 2)
+        self.assertEqual(self.started, 2)
+
+    async def test_cancelled_sync(self) -> None:
+        api = EdupageApi(transport=SlowTransport(handler=handler))
+        s = session()
+        s.esid = "valid"
+        first = asyncio.create_task(api.v2.sync(s, tables={"Timetable": [""]}))
+        second = asyncio.create_task(api.v2.sync(s, tables={"Timetable": [""]}))
+        await asyncio.sleep(0)
+        first.cancel()
+        self.assertIn("Timetable", await second)
+        self.assertEqual(len(api.transport.requests), 1)
@@ -0,0 +1,42 @@
+import json
+import os
+import tempfile
+import unittest
+
+from timetables.parser.edupage.api import EdupageApi, FakeTransport, Response
+from timetables.parser.edupage.bulk import MissingCache, check_many
+
+RESPONSES = {
+    "https://existing.edupage.org/connect_mobile.php": "ok",
+    "https://missing.edupage.org/connect_mobile.php": "",
+    "https://busy.edupage.org/connect_mobile.php": Response(503, b"<html>"),
+    "https://limited.edupage.org/connect_mobile.php": Response(429, b"<html>"),
+}
+
+
+class CheckManyTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "edupage_missing.json")
+        self.api = EdupageApi(transport=FakeTransport(RESPONSES))
+
+    async def test_check_many(self) -> None:
+        names = ["existing", "missing", "busy", "limited"]
+        results = await check_many(self.api, names, missing=MissingCache(self.path))
+        self.assertIs(results["existing"], True)
+        self.assertIs(results["missing"], False)
+        self.assertIsInstance(results["busy"], ValueError)
+        self.assertIsInstance(results["limited"], ValueError)
+        # only definite negatives are remembered
+        with open(self.path) as f:
+            self.assertEqual(list(json.load(f)), ["missing"])
+
+    async def test_missing_not_checked_again(self) -> None:
+        missing = MissingCache(self.path)
+        await check_many(self.api, ["missing"], missing=missing)
+        results = await check_many(
+            self.api, ["missing", "existing"], missing=MissingCache(self.path)
+        )
+        self.assertEqual(results, {"missing": False, "existing": True})
+        self.assertEqual(len(self.api.transport.requests), 2)
@@ -0,0 +1,146 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from timetables.parser.edupage.cache import (
+    FileCache,
+    RedisCache,
+    RedisError,
+    SqliteCache,
+)
+
+from .resp import RespServer
+
+ROWS = [{"id": "*1", "name": "1A"}, {"id": "*2", "name": "Zażółć"}]
+
+
+class CacheBackendTests:
+    """
+    Tests run against every CacheBackend implementation.
+    """
+
+    async def make_cache(self):
+        raise NotImplementedError
+
+    async def asyncSetUp(self) -> None:
+        self.cache = await self.make_cache()
+
+    async def asyncTearDown(self) -> None:
+        await self.cache.close()
+
+    async def test_get_missing(self) -> None:
+        self.assertEqual(await self.cache.get_many(["edupage/none"]), {})
+        self.assertIsNone(await self.cache.get("edupage/none"))
+
+    async def test_put_get(self) -> None:
+        await self.cache.put_many({"edupage/classes": ROWS, "edupage/empty": []})
+        self.assertEqual(
+            await self.cache.get_many(["edupage/classes", "edupage/empty", "x/y"]),
+            {"edupage/classes": ROWS, "edupage/empty": []},
+        )
+
+    async def test_overwrite(self) -> None:
+        await self.cache.put("edupage/classes", ROWS)
+        await self.cache.put("edupage/classes", ROWS[:1])
+        self.assertEqual(await self.cache.get("edupage/classes"), ROWS[:1])
+
+    async def test_ttl(self) -> None:
+        await self.cache.put("edupage/fresh", ROWS, ttl=60)
+        self.assertEqual(await self.cache.get("edupage/fresh"), ROWS)
+        await self.cache.put("edupage/stale", ROWS, ttl=1)
+        await asyncio.sleep(1.1)
+        self.assertIsNone(await self.cache.get("edupage/stale"))
+
+    async def test_empty(self) -> None:
+        await self.cache.put_many({})
+        self.assertEqual(await self.cache.get_many([]), {})
+
+
+class FileCacheTest(CacheBackendTests, unittest.IsolatedAsyncioTestCase):
+    async def make_cache(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        return FileCache(self.directory.name)
+
+    async def test_key_stays_in_directory(self) -> None:
+        await self.cache.put("../../edupage/classes", ROWS)
+        path = os.path.join(self.directory.name, "edupage", "classes.json.z")
+        self.assertTrue(os.path.isfile(path))
+
+    async def test_concurrent_writes(self) -> None:
+        # parsers of the same school write the same keys from several threads
+        for _ in range(10):
+            await asyncio.gather(
+                *(self.cache.put_many({"edupage/classes": ROWS}) for _ in range(8))
+            )
+        self.assertEqual(await self.cache.get("edupage/classes"), ROWS)
+        files = os.listdir(os.path.join(self.directory.name, "edupage"))
+        self.assertEqual(files, ["classes.json.z"])
+
+
+class SqliteCacheTest(CacheBackendTests, unittest.IsolatedAsyncioTestCase):
+    async def make_cache(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return SqliteCache(os.path.join(directory.name, "cache.db"))
+
+    async def test_many_keys(self) -> None:
+        # more keys than a single SELECT can hold
+        items = {f"edupage/{i}": [i] for i in range(1200)}
+        await self.cache.put_many(items)
+        self.assertEqual(await self.cache.get_many(items), items)
+
+
+class RedisCacheTest(CacheBackendTests, unittest.IsolatedAsyncioTestCase):
+    password = None
+
+    async def make_cache(self):
+        self.server = RespServer(password=self.password)
+        await self.server.start()
+        self.addAsyncCleanup(self.server.stop)
+        return RedisCache(port=self.server.port, password=self.password, db=1)
+
+    async def test_prefix(self) -> None:
+        await self.cache.put("edupage/classes", ROWS)
+        self.assertIn(b"edupage:edupage/classes", self.server.data)
+
+    async def test_reuses_connection(self) -> None:
+        for _ in range(3):
+            await self.cache.put("edupage/classes", ROWS)
+            await self.cache.get("edupage/classes")
+        self.assertEqual(self.server.connections, 1)
+
+    async def test_cancelled_command(self) -> None:
+        await self.cache.put_many({"a": "A", "b": "B"})
+        self.server.delays["edupage:a"] = 0.2
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(self.cache.get_many(["a"]), 0.05)
+        # the reply of the cancelled command must not be read
+        self.assertEqual(await self.cache.get_many(["b"]), {"b": "B"})
+
+    async def test_concurrent_commands(self) -> None:
+        await self.cache.put_many({str(i): i for i in range(20)})
+        values = await asyncio.gather(*(self.cache.get(str(i)) for i in range(20)))
+        self.assertEqual(values, list(range(20)))
+
+
+class RedisCacheAuthTest(RedisCacheTest):
+    password = "secret"
+
+    async def test_wrong_password(self) -> None:
+        cache = RedisCache(port=self.server.port, password="wrong")
+        with self.assertRaises(RedisError):
+            await cache.get("edupage/classes")
+        await cache.close()
+
+    async def test_failed_auth_is_retried(self) -> None:
+        await self.cache.put("edupage/classes", ROWS)
+        cache = RedisCache(port=self.server.port, password="wrong")
+        self.addAsyncCleanup(cache.close)
+        with self.assertRaises(RedisError):
+            await cache.get("edupage/classes")
+        # e.g. after the password is changed on the server
+        cache.password = self.password
+        self.assertEqual(await cache.get("edupage/classes"), ROWS)
+        self.assertEqual(self.server.connections, 3)
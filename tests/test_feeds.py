@@ -0,0 +1,64 @@
+import copy
+import unittest
+from datetime import date
+
+from timetables.parser.edupage import EdupageParser
+from timetables.parser.edupage.feeds import FeedCache
+
+from .fixtures import TABLES, Edupage, session
+
+
+class FeedCacheTest(unittest.IsolatedAsyncioTestCase):
+    async def index(self, tables: dict):
+        edupage = Edupage(tables=tables)
+        async with EdupageParser(session(), transport=edupage.transport()) as parser:
+            parser.enqueue_all()
+            await parser.run_all()
+            return parser.index
+
+    async def asyncSetUp(self) -> None:
+        self.feeds = FeedCache("test", start=date(2021, 9, 1))
+        self.assertEqual(self.feeds.update(await self.index(TABLES)), 6)
+
+    def render_all(self) -> None:
+        for kind in ("registers", "teachers", "classrooms"):
+            for name in self.feeds.names(kind):
+                for format in self.feeds.FORMATS:
+                    self.feeds.get(kind, name, format)
+
+    def test_render(self) -> None:
+        feed = self.feeds.get("registers", "1A", "ics")
+        self.assertEqual(feed.content_type, "text/calendar")
+        self.assertIn(b"DTSTART:20210830T080000\r\n", feed.body)
+        self.assertIn(b"LOCATION:101\r\n", feed.body)
+        self.assertIs(self.feeds.get("registers", "1A", "ics"), feed)
+        self.assertIsNone(self.feeds.get("registers", "2A", "ics"))
+        self.assertEqual(self.feeds.stats()["bytes"], len(feed.body))
+        with self.assertRaises(ValueError):
+            self.feeds.get("registers", "1A", "xml")
+
+    async def test_unchanged(self) -> None:
+        self.render_all()
+        stats = self.feeds.stats()
+        self.assertEqual(self.feeds.update(await self.index(TABLES)), 0)
+        self.render_all()
+        self.assertEqual(self.feeds.stats()["renders"], stats["renders"])
+        self.assertEqual(self.feeds.stats()["bytes"], stats["bytes"])
+
+    async def test_selective_render(self) -> None:
+        self.render_all()
+        feed = self.feeds.get("registers", "1B", "ics")
+        etag = self.feeds.get("registers", "1A", "ics").etag
+        renders = self.feeds.renders
+        # the lesson of 1A moves out of classroom 101
+        tables = copy.deepcopy(TABLES)
+        tables["lessons"][0]["classroomidss"] = []
+        # 1A, its teacher and the classroom (which does not exist anymore)
+        self.assertEqual(self.feeds.update(await self.index(tables)), 2)
+        self.assertEqual(self.feeds.names("classrooms"), [])
+        self.assertIsNone(self.feeds.get("classrooms", "101", "ics"))
+        self.assertIs(self.feeds.get("registers", "1B", "ics"), feed)
+        self.assertNotEqual(self.feeds.get("registers", "1A", "ics").etag, etag)
+        self.assertEqual(self.feeds.renders, renders + 1)
+        total = sum(len(feed.body) for feed in self.feeds.feeds.values())
+        self.assertEqual(self.feeds.stats()["bytes"], total)
@@ -0,0 +1,109 @@
+import asyncio
+import unittest
+from time import monotonic
+
+from timetables.parser.edupage.api import Hedger
+
+
+class Calls:
+    """
+    Calls answering after the given delays, in order; an exception is raised.
+    """
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.started = 0
+        self.cancelled = 0
+
+    async def __call__(self):
+        delay, answer = self.answers[self.started % len(self.answers)]
+        self.started += 1
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+class HedgerTest(unittest.IsolatedAsyncioTestCase):
+    def hedger(self, **kwargs) -> Hedger:
+        kwargs = dict(min_delay=0.05, window=20, min_samples=20, **kwargs)
+        hedger = Hedger(**kwargs)
+        # the delay is the minimum one, 0.05s
+        hedger.latencies.extend([0.01] * 20)
+        return hedger
+
+    async def test_no_samples(self) -> None:
+        hedger = Hedger(min_samples=20)
+        calls = Calls((0.1, "first"), (0.0, "second"))
+        self.assertIsNone(hedger.delay())
+        self.assertEqual(await hedger.run(calls), "first")
+        self.assertEqual(calls.started, 1)
+        self.assertEqual(len(hedger.latencies), 1)
+
+    async def test_fast_request(self) -> None:
+        hedger = self.hedger()
+        calls = Calls((0.01, "first"), (0.0, "second"))
+        self.assertEqual(await hedger.run(calls), "first")
+        self.assertEqual(calls.started, 1)
+        self.assertEqual(hedger.stats()["hedged"], 0)
+
+    async def test_hedge_wins(self) -> None:
+        hedger = self.hedger()
+        calls = Calls((1.0, "first"), (0.01, "second"))
+        started = monotonic()
+        self.assertEqual(await hedger.run(calls), "second")
+        self.assertLess(monotonic() - started, 0.5)
+        await asyncio.sleep(0)
+        # the slower request is cancelled
+        self.assertEqual((calls.started, calls.cancelled), (2, 1))
+        self.assertEqual(hedger.hedged, 1)
+        self.assertEqual(hedger.hedge_wins, 1)
+
+    async def test_primary_wins(self) -> None:
+        hedger = self.hedger()
+        calls = Calls((0.1, "first"), (1.0, "second"))
+        self.assertEqual(await hedger.run(calls), "first")
+        await asyncio.sleep(0)
+        self.assertEqual((calls.started, calls.cancelled), (2, 1))
+        self.assertEqual(hedger.hedged, 1)
+        self.assertEqual(hedger.hedge_wins, 0)
+
+    async def test_max_rate(self) -> None:
+        # 10% of the 20 most recent requests; the median latency stays low
+        hedger = self.hedger(max_rate=0.1, percentile=50)
+        calls = Calls((0.1, "slow"))
+        for _ in range(5):
+            self.assertEqual(await hedger.run(calls), "slow")
+        self.assertEqual(hedger.requests, 5)
+        self.assertEqual(hedger.hedged, 2)
+        self.assertEqual(calls.started, 7)
+
+    async def test_primary_fails(self) -> None:
+        hedger = self.hedger()
+        calls = Calls((0.1, ValueError("first")), (0.1, "second"))
+        self.assertEqual(await hedger.run(calls), "second")
+        self.assertEqual(hedger.hedge_wins, 1)
+
+    async def test_hedge_fails(self) -> None:
+        hedger = self.hedger()
+        calls = Calls((0.1, "first"), (0.01, ValueError("second")))
+        self.assertEqual(await hedger.run(calls), "first")
+        self.assertEqual(hedger.hedge_wins, 0)
+
+    async def test_both_fail(self) -> None:
+        hedger = self.hedger()
+        calls = Calls((0.1, ValueError("first")), (0.1, ValueError("second")))
+        with self.assertRaises(ValueError):
+            await hedger.run(calls)
+        self.assertEqual(calls.started, 2)
+
+    async def test_not_hedged_fails(self) -> None:
+        hedger = self.hedger()
+        calls = Calls((0.01, ValueError("first")))
+        with self.assertRaisesRegex(ValueError, "first"):
+            await hedger.run(calls)
+        self.assertEqual(calls.started, 1)
@@ -0,0 +1,141 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+import unittest
+
+from timetables.parser.edupage.api import FakeTransport
+from timetables.parser.edupage.jobs import SqliteJobQueue, Worker
+
+from .fixtures import Edupage, session
+
+
+class SlowV1Transport(FakeTransport):
+    async def post(self, url, params=None, data=None, headers=None):
+        if "connect_mobile" in url:
+            await asyncio.sleep(1.0)
+        return await super().post(url, params, data, headers)
+
+
+def lease_all(path: str, worker: str, leased: multiprocessing.Queue) -> None:
+    async def run() -> None:
+        queue = SqliteJobQueue(path)
+        while True:
+            job = await queue.lease(worker, 60)
+            if job is None:
+                break
+            leased.put(job.id)
+            await queue.complete(job, time.time(), 0.0)
+
+    asyncio.run(run())
+
+
+class SqliteJobQueueTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.queue = SqliteJobQueue(
+            os.path.join(directory.name, "jobs.db"),
+            max_attempts=2,
+            retry_interval=0.0,
+        )
+
+    async def test_complete(self) -> None:
+        await self.queue.put_many([session("first"), session("second")])
+        jobs = [await self.queue.lease("worker", 60) for _ in range(3)]
+        self.assertEqual([job.edupage for job in jobs[:2]], ["first", "second"])
+        self.assertIsNone(jobs[2])
+        for job in jobs[:2]:
+            await self.queue.complete(job, time.time(), 0.1)
+        self.assertEqual(await self.queue.stats(), {"done": 2})
+        self.assertEqual(len(await self.queue.timings("first")), 1)
+
+    async def test_put_updates_pending_job(self) -> None:
+        first = await self.queue.put(session())
+        second = await self.queue.put(session())
+        self.assertEqual(first, second)
+        self.assertEqual(await self.queue.stats(), {"pending": 1})
+
+    async def test_retry(self) -> None:
+        await self.queue.put(session())
+        for attempt in (1, 2):
+            job = await self.queue.lease("worker", 60)
+            self.assertEqual(job.attempts, attempt)
+            await self.queue.fail(job, time.time(), 0.1, "error")
+        self.assertIsNone(await self.queue.lease("worker", 60))
+        self.assertEqual(await self.queue.stats(), {"failed": 1})
+
+    async def test_expired_lease(self) -> None:
+        await self.queue.put(session())
+        for attempt in (1, 2):
+            job = await self.queue.lease(f"worker{attempt}", 0.01)
+            self.assertEqual(job.attempts, attempt)
+            # the worker dies without completing the job
+            await asyncio.sleep(0.02)
+        self.assertIsNone(await self.queue.lease("worker3", 0.01))
+        self.assertEqual(await self.queue.stats(), {"failed": 1})
+
+    async def test_several_processes(self) -> None:
+        ids = await self.queue.put_many([session(f"school{i}") for i in range(200)])
+        leased = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=lease_all, args=(self.queue.path, f"worker{i}", leased)
+            )
+            for i in range(4)
+        ]
+        for process in processes:
+            process.start()
+        # read while the processes run, so that they are not blocked by a full pipe
+        leased_ids = [leased.get(timeout=30) for _ in ids]
+        for process in processes:
+            process.join(timeout=30)
+            self.assertEqual(process.exitcode, 0)
+        # every job was leased exactly once
+        self.assertEqual(sorted(leased_ids), sorted(ids))
+        self.assertEqual(await self.queue.stats(), {"done": 200})
+
+    async def test_lost_lease(self) -> None:
+        await self.queue.put(session())
+        job = await self.queue.lease("slow", 0.01)
+        await asyncio.sleep(0.02)
+        other = await self.queue.lease("fast", 60)
+        self.assertFalse(await self.queue.renew(job, 60))
+        # the result of the slow worker is ignored
+        await self.queue.fail(job, time.time(), 0.1, "error")
+        await self.queue.complete(other, time.time(), 0.1)
+        self.assertEqual(await self.queue.stats(), {"done": 1})
+
+
+class WorkerTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        # the v1 "timetables" payload is extracted to the working directory
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cwd = os.getcwd()
+        os.chdir(directory.name)
+        self.addCleanup(os.chdir, cwd)
+        self.queue = SqliteJobQueue(os.path.join(directory.name, "jobs.db"))
+
+    async def test_partial_result(self) -> None:
+        await self.queue.put(session(), dict(try_v1_full_teachers=True))
+        results = []
+
+        async def on_result(job, result) -> None:
+            results.append(result)
+
+        worker = Worker(
+            self.queue,
+            on_result=on_result,
+            transport=SlowV1Transport(handler=Edupage()),
+            budget=0.5,
+        )
+        await worker.run(until_empty=True)
+        self.assertEqual(len(results), 1)
+        result = results[0]
+        self.assertTrue(result.partial)
+        self.assertEqual(result.skipped, ("/get/v1/timetables/teachers",))
+        self.assertTrue(result.ds.lessons)
+        self.assertEqual(worker.partial, 1)
+        self.assertEqual(await self.queue.stats(), {"done": 1})
@@ -0,0 +1,142 @@
+import asyncio
+import unittest
+from collections import defaultdict
+from urllib.parse import urlparse
+
+from timetables.parser.edupage.api import (
+    AdaptiveLimiter,
+    AdaptiveTransport,
+    FakeTransport,
+    Response,
+)
+
+
+class AdaptiveLimiterTest(unittest.IsolatedAsyncioTestCase):
+    async def test_additive_increase(self) -> None:
+        limiter = AdaptiveLimiter(initial=4)
+        # about one more slot per round trip (`limit` responses)
+        for _ in range(4):
+            await limiter.release(await limiter.acquire())
+        self.assertGreater(limiter.limit, 4.9)
+        self.assertLess(limiter.limit, 5.0)
+        self.assertEqual(limiter.successes, 4)
+        self.assertEqual(limiter.in_flight, 0)
+
+    async def test_slow_response(self) -> None:
+        limiter = AdaptiveLimiter(initial=4, latency_target=0.01)
+        started = await limiter.acquire()
+        await asyncio.sleep(0.02)
+        await limiter.release(started)
+        self.assertEqual(limiter.limit, 4)
+        self.assertEqual(limiter.successes, 1)
+
+    async def test_max_limit(self) -> None:
+        limiter = AdaptiveLimiter(initial=10, max_limit=5)
+        self.assertEqual(limiter.limit, 5)
+        for _ in range(20):
+            await limiter.release(await limiter.acquire())
+        self.assertEqual(limiter.limit, 5)
+
+    async def test_multiplicative_decrease(self) -> None:
+        limiter = AdaptiveLimiter(initial=8)
+        started = [await limiter.acquire() for _ in range(8)]
+        # requests of the same round trip decrease the limit once
+        for value in started:
+            await limiter.release(value, overloaded=True)
+        self.assertEqual(limiter.limit, 4)
+        self.assertEqual(limiter.failures, 8)
+        # the next round trip decreases it again
+        await limiter.release(await limiter.acquire(), overloaded=True)
+        self.assertEqual(limiter.limit, 2)
+        for _ in range(3):
+            await limiter.release(await limiter.acquire(), overloaded=True)
+        self.assertEqual(limiter.limit, 1)
+
+    async def test_not_completed(self) -> None:
+        limiter = AdaptiveLimiter(initial=4)
+        await limiter.release(await limiter.acquire(), overloaded=None)
+        self.assertEqual(limiter.limit, 4)
+        self.assertEqual((limiter.successes, limiter.failures), (0, 0))
+        self.assertEqual(limiter.in_flight, 0)
+        self.assertIsNone(limiter.percentile(50))
+
+    async def test_waits_for_slot(self) -> None:
+        limiter = AdaptiveLimiter(initial=1)
+        started = await limiter.acquire()
+        waiting = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0.01)
+        self.assertFalse(waiting.done())
+        await limiter.release(started)
+        await asyncio.wait_for(waiting, 1)
+        self.assertEqual(limiter.in_flight, 1)
+
+
+class Upstream(FakeTransport):
+    """
+    Answers after `delay` seconds, recording the most requests in flight.
+    """
+
+    def __init__(self, status: int = 200, delay: float = 0.05):
+        super().__init__(handler=lambda request: Response(status, b"ok"))
+        self.delay = delay
+        self.in_flight = defaultdict(int)
+        self.max_in_flight = defaultdict(int)
+
+    async def post(self, url, params=None, data=None, headers=None):
+        for key in (urlparse(url).netloc, "all"):
+            self.in_flight[key] += 1
+            self.max_in_flight[key] = max(self.max_in_flight[key], self.in_flight[key])
+        try:
+            await asyncio.sleep(self.delay)
+            return await super().post(url, params, data, headers)
+        finally:
+            for key in (urlparse(url).netloc, "all"):
+                self.in_flight[key] -= 1
+
+
+class AdaptiveTransportTest(unittest.IsolatedAsyncioTestCase):
+    async def post_many(self, transport, urls) -> list:
+        return await asyncio.gather(*(transport.post(url) for url in urls))
+
+    async def test_host_limit(self) -> None:
+        upstream = Upstream()
+        transport = AdaptiveTransport(upstream, host_max_limit=2, initial=4)
+        await self.post_many(transport, ["https://a.edupage.org/"] * 6)
+        self.assertEqual(upstream.max_in_flight["a.edupage.org"], 2)
+        self.assertEqual(transport.hosts["a.edupage.org"].limit, 2)
+
+    async def test_global_limit(self) -> None:
+        upstream = Upstream()
+        transport = AdaptiveTransport(upstream, max_limit=3, initial=3)
+        urls = [f"https://{host}.edupage.org/" for host in "abc"] * 3
+        await self.post_many(transport, urls)
+        self.assertEqual(upstream.max_in_flight["all"], 3)
+        self.assertEqual(
+            set(transport.stats()["hosts"]),
+            {"a.edupage.org", "b.edupage.org", "c.edupage.org"},
+        )
+
+    async def test_overload(self) -> None:
+        upstream = Upstream(status=503)
+        transport = AdaptiveTransport(upstream, initial=4)
+        responses = await self.post_many(
+            transport, ["https://a.edupage.org/", "https://b.edupage.org/"]
+        )
+        self.assertEqual([r.status for r in responses], [503, 503])
+        # both requests started before the first decrease
+        self.assertEqual(transport.limiter.limit, 2)
+        self.assertEqual(transport.limiter.failures, 2)
+        # and every host by its own response
+        self.assertEqual(transport.hosts["a.edupage.org"].limit, 2)
+        self.assertEqual(transport.hosts["b.edupage.org"].limit, 2)
+
+    async def test_cancelled(self) -> None:
+        upstream = Upstream(delay=1.0)
+        transport = AdaptiveTransport(upstream, initial=4)
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(transport.post("https://a.edupage.org/"), 0.05)
+        host = transport.hosts["a.edupage.org"]
+        for limiter in (transport.limiter, host):
+            self.assertEqual(limiter.limit, 4)
+            self.assertEqual((limiter.successes, limiter.failures), (0, 0))
+            self.assertEqual(limiter.in_flight, 0)
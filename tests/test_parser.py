@@ -0,0 +1,258 @@
+import copy
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from timetables.parser.edupage import EdupageParser, vector
+from timetables.parser.edupage.cache import FileCache
+from timetables.parser.edupage.deadline import Deadline
+from timetables.parser.edupage.memo import ParseMemo
+
+from .fixtures import TABLES, TEACHERS_V1, Edupage, session
+
+
+class ParserTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        # the v1 "timetables" payload is extracted to the working directory
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cwd = os.getcwd()
+        os.chdir(directory.name)
+        self.addCleanup(os.chdir, cwd)
+        self.cache = FileCache(os.path.join(directory.name, "cache"))
+
+
+class VersionsTest(ParserTestCase):
+    VERSIONS = [
+        {"dbi": {**TABLES, "teachers": TEACHERS_V1}, "text": "Old", "datefrom": None},
+        {"dbi": TABLES, "text": "New", "datefrom": "2021-09-01"},
+    ]
+
+    async def parse(self, edupage: Edupage) -> None:
+        parser = EdupageParser(
+            session(), cache_backend=self.cache, transport=edupage.transport()
+        )
+        async with parser:
+            parser.enqueue_all(all_versions=True)
+            await parser.run_all()
+            self.assertEqual([v.name for v in parser.versions], ["Old", "New"])
+            for version in parser.versions:
+                ds = await parser.parse_version(version)
+                self.assertEqual(len(ds.lessons), 2)
+
+    async def test_versions_with_cached_tables(self) -> None:
+        edupage = Edupage(versions=self.VERSIONS)
+        for _ in range(3):
+            await self.parse(edupage)
+        self.assertEqual(edupage.calls["v1"], 1)
+
+    async def versions(self, edupage: Edupage, **kwargs) -> list:
+        parser = EdupageParser(session(), transport=edupage.transport(), **kwargs)
+        async with parser:
+            parser.enqueue_all(all_versions=True)
+            await parser.run_all()
+            return [version.name for version in parser.versions]
+
+    async def test_new_version_without_cache(self) -> None:
+        edupage = Edupage(versions=self.VERSIONS[:1])
+        self.assertEqual(await self.versions(edupage), ["Old"])
+        edupage.versions = self.VERSIONS
+        self.assertEqual(await self.versions(edupage), ["Old", "New"])
+        self.assertEqual(edupage.calls["v1"], 2)
+
+    async def test_new_version_after_cache_ttl(self) -> None:
+        edupage = Edupage(versions=self.VERSIONS[:1])
+        kwargs = dict(cache_backend=self.cache, cache_ttl=60)
+        self.assertEqual(await self.versions(edupage, **kwargs), ["Old"])
+        edupage.versions = self.VERSIONS
+        self.assertEqual(await self.versions(edupage, **kwargs), ["Old"])
+        # the extracted payload expires with the cached tables
+        expired = time.time() - 120
+        os.utime("timetables_test.json", (expired, expired))
+        self.assertEqual(await self.versions(edupage, **kwargs), ["Old", "New"])
+        self.assertEqual(edupage.calls["v1"], 2)
+
+    async def test_parse_version_shares_transport(self) -> None:
+        edupage = Edupage(versions=self.VERSIONS)
+        async with EdupageParser(session(), transport=edupage.transport()) as parser:
+            parser.enqueue_all(all_versions=True)
+            await parser.run_all()
+            # no transport of its own is created
+            with mock.patch(
+                "timetables.parser.edupage.api.api.AiohttpTransport",
+                side_effect=AssertionError("AiohttpTransport created"),
+            ):
+                ds = await parser.parse_version(parser.versions[0])
+        self.assertEqual(len(ds.lessons), 2)
+
+
+class TeacherNamesTest(ParserTestCase):
+    async def parse(self, edupage: Edupage, refresh: bool = False) -> list:
+        parser = EdupageParser(
+            session(),
+            cache_backend=self.cache,
+            transport=edupage.transport(),
+            refresh=refresh,
+        )
+        async with parser:
+            parser.enqueue_all(try_v1_full_teachers=True)
+            ds = await parser.run_all()
+        return sorted(teacher.name for teacher in ds.teachers.values())
+
+    async def test_cached_names(self) -> None:
+        edupage = Edupage()
+        names = ["Anna Nowak", "Jan Kowalski"]
+        self.assertEqual(await self.parse(edupage), names)
+        self.assertEqual(await self.parse(edupage), names)
+        self.assertEqual(edupage.calls, {"v1": 1, "v2": 1})
+
+    async def test_cached_names_on_refresh(self) -> None:
+        edupage = Edupage()
+        names = ["Anna Nowak", "Jan Kowalski"]
+        for _ in range(3):
+            self.assertEqual(await self.parse(edupage, refresh=True), names)
+        self.assertEqual(edupage.calls, {"v1": 1, "v2": 3})
+
+    async def test_unknown_teacher(self) -> None:
+        edupage = Edupage()
+        await self.parse(edupage, refresh=True)
+        teacher = {"id": "*9", "firstname": "Ewa", "lastname": "Lis"}
+        edupage.tables = {**TABLES, "teachers": [*TABLES["teachers"], teacher]}
+        edupage.versions[0]["dbi"]["teachers"] = [*TEACHERS_V1, teacher]
+        self.assertIn("Ewa Lis", await self.parse(edupage, refresh=True))
+        self.assertEqual(edupage.calls, {"v1": 2, "v2": 2})
+
+
+class DeadlineTest(ParserTestCase):
+    async def test_slow_decode_is_skipped(self) -> None:
+        decode_versions = EdupageParser._decode_versions
+
+        def slow_decode_versions(parser, *args):
+            time.sleep(0.5)
+            return decode_versions(parser, *args)
+
+        edupage = Edupage()
+        parser = EdupageParser(
+            session(), transport=edupage.transport(), deadline=Deadline(0.4)
+        )
+        with mock.patch.object(
+            EdupageParser, "_decode_versions", slow_decode_versions
+        ):
+            async with parser:
+                parser.enqueue_all(try_v1_full_teachers=True)
+                started = time.monotonic()
+                ds = await parser.run_all()
+        # the event loop is not blocked while decoding
+        self.assertLess(time.monotonic() - started, 0.4)
+        self.assertEqual(parser.skipped, ["/get/v1/timetables/teachers"])
+        self.assertTrue(ds.lessons)
+
+
+class MemoTest(ParserTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.memo = ParseMemo()
+        self.edupage = Edupage()
+
+    async def parse(self, **kwargs):
+        options = kwargs.pop("options", {})
+        parser = EdupageParser(
+            session(), transport=self.edupage.transport(), memo=self.memo, **kwargs
+        )
+        async with parser:
+            parser.enqueue_all(**options)
+            return await parser.run_all()
+
+    async def test_unchanged(self) -> None:
+        ds = await self.parse()
+        self.assertIs(await self.parse(), ds)
+        self.assertEqual((self.memo.hits, self.memo.misses), (1, 1))
+        self.assertEqual(self.edupage.calls["v2"], 2)
+
+    async def test_changed_table(self) -> None:
+        ds = await self.parse()
+        tables = copy.deepcopy(TABLES)
+        tables["subjects"][0]["name"] = "Maths"
+        self.edupage.tables = tables
+        changed = await self.parse()
+        self.assertIsNot(changed, ds)
+        self.assertEqual((self.memo.hits, self.memo.misses), (0, 2))
+        subjects = [lesson.subject.name for lesson in changed.lessons]
+        self.assertEqual(subjects, ["Maths", "Maths"])
+        self.assertIs(await self.parse(), changed)
+
+    async def test_changed_teacher_names(self) -> None:
+        options = dict(options=dict(try_v1_full_teachers=True))
+        ds = await self.parse(cache_backend=self.cache, **options)
+        self.assertIs(await self.parse(cache_backend=self.cache, **options), ds)
+        names = {"7": "Jan Nowy", "8": "Anna Nowak"}
+        await self.cache.put("test/teacher_names", names)
+        changed = await self.parse(cache_backend=self.cache, **options)
+        self.assertIsNot(changed, ds)
+        teachers = sorted(teacher.name for teacher in changed.teachers.values())
+        self.assertEqual(teachers, ["Anna Nowak", "Jan Nowy"])
+        self.assertEqual((self.memo.hits, self.memo.misses), (1, 2))
+
+    @unittest.skipUnless(vector.is_available(), "numpy is not installed")
+    async def test_changed_options(self) -> None:
+        ds = await self.parse()
+        vectorized = await self.parse(vectorize=True)
+        self.assertIsNot(vectorized, ds)
+        columnar = await self.parse(vectorize=True, build_lessons=False)
+        self.assertIsNot(columnar, vectorized)
+        self.assertEqual(columnar.lessons, [])
+        self.assertEqual((self.memo.hits, self.memo.misses), (0, 3))
+        # only the last result of a school is kept
+        self.assertIs(await self.parse(vectorize=True, build_lessons=False), columnar)
+
+    async def test_without_memo(self) -> None:
+        self.memo = None
+        self.assertIsNot(await self.parse(), await self.parse())
+
+
+@unittest.skipUnless(vector.is_available(), "numpy is not installed")
+class VectorizedTest(ParserTestCase):
+    @staticmethod
+    def rows(lessons) -> list:
+        return sorted(
+            (
+                lesson.internal_id,
+                lesson.weekday.value,
+                lesson.number,
+                lesson.subject.name,
+                sorted(teacher.name for teacher in lesson.teachers),
+            )
+            for lesson in lessons
+        )
+
+    async def test_columns_without_lessons(self) -> None:
+        edupage = Edupage()
+        async with EdupageParser(session(), transport=edupage.transport()) as parser:
+            parser.enqueue_all()
+            expected = self.rows((await parser.run_all()).lessons)
+        parser = EdupageParser(
+            session(),
+            transport=edupage.transport(),
+            vectorize=True,
+            build_lessons=False,
+        )
+        async with parser:
+            parser.enqueue_all()
+            ds = await parser.run_all()
+            self.assertEqual(ds.lessons, [])
+            columns = parser.columns
+            rows = []
+            for internal_id, lesson, weekday, number in zip(
+                columns.internal_id.tolist(),
+                columns.lesson.tolist(),
+                columns.weekday.tolist(),
+                columns.number.tolist(),
+            ):
+                lesson = columns.lessons[lesson]
+                teachers = sorted(teacher.name for teacher in lesson["teachers"])
+                rows.append(
+                    (internal_id, weekday, number, lesson["subject"].name, teachers)
+                )
+        self.assertEqual(sorted(rows), expected)
@@ -0,0 +1,117 @@
+import asyncio
+import time
+import unittest
+
+from timetables.parser.edupage.api import FakeTransport
+from timetables.parser.edupage.api.const import TABLES_V2_TIMETABLE
+from timetables.parser.edupage.scheduler import RefreshScheduler
+
+from .fixtures import Edupage, session
+
+
+class SlowTransport(FakeTransport):
+    async def post(self, url, params=None, data=None, headers=None):
+        await asyncio.sleep(0.1)
+        return await super().post(url, params, data, headers)
+
+
+class RefreshSchedulerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.edupage = Edupage()
+        self.refreshed = []
+        self.errors = []
+
+    def scheduler(self, *sessions, **kwargs) -> RefreshScheduler:
+        async def on_refresh(session, result) -> None:
+            self.refreshed.append(session.edupage_name())
+
+        async def on_error(session, e) -> None:
+            self.errors.append(session.edupage_name())
+
+        kwargs.setdefault("transport", SlowTransport(handler=self.edupage))
+        scheduler = RefreshScheduler(
+            sessions or [session()],
+            on_refresh=on_refresh,
+            on_error=on_error,
+            requests_per_minute=6000,
+            **kwargs,
+        )
+        self.addAsyncCleanup(scheduler.close)
+        return scheduler
+
+    async def run_scheduler(self, scheduler: RefreshScheduler, seconds: float):
+        task = asyncio.create_task(scheduler.run())
+        await asyncio.sleep(seconds)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+    async def test_force_refresh(self) -> None:
+        scheduler = self.scheduler()
+        result = await scheduler.force_refresh("test")
+        self.assertEqual(len(result.ds.lessons), 2)
+        self.assertFalse(result.partial)
+        self.assertEqual(self.refreshed, ["test"])
+        self.assertIn("test", scheduler.refreshed_at)
+        # the next refresh is due before the data goes stale
+        due, edupage, table = scheduler.next_due()
+        validity = scheduler.validity(table)
+        self.assertEqual(edupage, "test")
+        self.assertLess(due, scheduler.refreshed_at["test"] + validity)
+        self.assertGreater(due, scheduler.refreshed_at["test"] + validity / 2 - 1)
+
+    async def test_concurrent_force_refresh(self) -> None:
+        scheduler = self.scheduler()
+        results = await asyncio.gather(
+            scheduler.force_refresh("test"), scheduler.force_refresh("test")
+        )
+        self.assertIs(results[0], results[1])
+        self.assertEqual(self.edupage.calls["v2"], 1)
+        self.assertEqual(self.refreshed, ["test"])
+
+    async def test_force_refresh_while_scheduled(self) -> None:
+        scheduler = self.scheduler(initial_spread=0)
+        task = asyncio.create_task(scheduler.run())
+        self.addCleanup(task.cancel)
+        await asyncio.sleep(0.05)
+        self.assertIn("test", scheduler._running)
+        await scheduler.force_refresh("test")
+        # a third refresh must not be started
+        await asyncio.sleep(0.2)
+        self.assertEqual(self.edupage.calls["v2"], 1)
+        self.assertEqual(self.refreshed, ["test"])
+        self.assertEqual(scheduler._running, set())
+
+    async def test_scheduled_while_forced(self) -> None:
+        scheduler = self.scheduler(initial_spread=0.05)
+        forced = asyncio.create_task(scheduler.force_refresh("test"))
+        await self.run_scheduler(scheduler, 0.3)
+        await forced
+        self.assertEqual(self.edupage.calls["v2"], 1)
+        self.assertEqual(self.refreshed, ["test"])
+
+    async def test_run(self) -> None:
+        sessions = [session(f"school{i}") for i in range(4)]
+        scheduler = self.scheduler(*sessions, initial_spread=0.1, concurrency=2)
+        await self.run_scheduler(scheduler, 0.5)
+        self.assertEqual(sorted(self.refreshed), [s.edupage_name() for s in sessions])
+        self.assertEqual(self.edupage.calls["v2"], 4)
+        # every table of every school is scheduled again
+        self.assertEqual(len(scheduler._due), 4 * len(TABLES_V2_TIMETABLE))
+
+    async def test_failure(self) -> None:
+        transport = FakeTransport({})
+        scheduler = self.scheduler(transport=transport, retry_interval=600)
+        with self.assertRaises(Exception):
+            await scheduler.force_refresh("test")
+        self.assertEqual(self.errors, ["test"])
+        self.assertEqual(scheduler.failures, {"test": 1})
+        due, _, _ = scheduler.next_due()
+        self.assertGreater(due, time.time() + 500)
+
+    async def test_remove(self) -> None:
+        scheduler = self.scheduler(initial_spread=0)
+        scheduler.remove("test")
+        self.assertIsNone(scheduler.next_due())
+        with self.assertRaises(KeyError):
+            await scheduler.force_refresh("test")
@@ -0,0 +1,115 @@
+import unittest
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from timetables.parser.edupage.api import AiohttpTransport
+from timetables.parser.edupage.server import DatasetStore, TimetableServer
+
+from .fixtures import Edupage, session
+
+
+class Portal:
+    def __init__(self, *sessions):
+        self.sessions = list(sessions)
+
+    def get_session(self, edupage: str):
+        return next(s for s in self.sessions if s.edupage_name() == edupage)
+
+
+class DatasetStoreTest(unittest.IsolatedAsyncioTestCase):
+    async def test_default_transport_is_shared(self) -> None:
+        store = DatasetStore(Portal(session()))
+        self.assertIsInstance(store.transport, AiohttpTransport)
+        await store.transport.open()
+        client = store.transport.session
+        await store.close()
+        self.assertTrue(client.closed)
+
+    async def test_load(self) -> None:
+        edupage = Edupage()
+        store = DatasetStore(
+            Portal(session("first"), session("second")),
+            transport=edupage.transport(),
+        )
+        for name in ("first", "second"):
+            data = await store.get(name)
+            self.assertEqual(len(data.lessons), 2)
+            self.assertEqual(sorted(data.entities["classes"]), ["1A", "1B"])
+        # fresh data is served from memory
+        await store.get("first")
+        self.assertEqual(edupage.calls["v2"], 2)
+        await store.close()
+
+    async def test_memory_includes_feeds(self) -> None:
+        store = DatasetStore(Portal(session()), transport=Edupage().transport())
+        data = await store.get("test")
+        size = store.size
+        feed = data.feeds.get("registers", "1A", "ics")
+        self.assertEqual(store.size, size + len(feed.body))
+        await store.close()
+
+    async def test_evicts_schools_with_feeds(self) -> None:
+        store = DatasetStore(
+            Portal(session("first"), session("second")),
+            transport=Edupage().transport(),
+        )
+        first = await store.get("first")
+        # room for two schools, but not for the feeds as well
+        store.max_memory = 2 * first.size + 100
+        await store.get("second")
+        self.assertEqual(list(store.entries), ["first", "second"])
+        server = TimetableServer(store)
+        async with TestClient(TestServer(server.app)) as client:
+            for name in ("1A", "1B", "Jan Kowalski"):
+                r = await client.get(f"/second/classes/{name}.ics")
+                self.assertIn(r.status, (200, 404))
+        self.assertEqual(list(store.entries), ["second"])
+        self.assertNotIn("first", store.feeds)
+
+
+class TimetableServerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.edupage = Edupage()
+        store = DatasetStore(Portal(session()), transport=self.edupage.transport())
+        self.client = TestClient(TestServer(TimetableServer(store).app))
+        await self.client.start_server()
+        self.addAsyncCleanup(self.client.close)
+
+    async def test_feed(self) -> None:
+        r = await self.client.get("/test/classes/1A.ics")
+        self.assertEqual(r.status, 200)
+        self.assertEqual(r.content_type, "text/calendar")
+        self.assertTrue((await r.text()).startswith("BEGIN:VCALENDAR"))
+        r = await self.client.get("/test/teachers/Anna Nowak.json")
+        self.assertEqual(r.content_type, "application/json")
+        r = await self.client.get("/test/classes/2A.ics")
+        self.assertEqual(r.status, 404)
+        r = await self.client.get("/test/subjects/Math.ics")
+        self.assertEqual(r.status, 404)
+
+    async def test_not_modified(self) -> None:
+        r = await self.client.get("/test/classes/1A.ics")
+        etag = r.headers["ETag"]
+        for value in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+            r = await self.client.get(
+                "/test/classes/1A.ics", headers={"If-None-Match": value}
+            )
+            self.assertEqual(r.status, 304)
+            self.assertEqual(r.headers["ETag"], etag)
+            self.assertEqual(await r.read(), b"")
+        r = await self.client.get(
+            "/test/classes/1A.ics", headers={"If-None-Match": '"other"'}
+        )
+        self.assertEqual(r.status, 200)
+        # other formats have other tags
+        r = await self.client.get("/test/classes/1A.json")
+        self.assertNotEqual(r.headers["ETag"], etag)
+
+    async def test_metrics(self) -> None:
+        await self.client.get("/test/classes/1A.ics")
+        await self.client.get("/test/classes/1A.ics")
+        r = await self.client.get("/metrics")
+        metrics = await r.json()
+        self.assertEqual(metrics["schools"], 1)
+        self.assertEqual(metrics["feeds"]["renders"], 1)
+        self.assertEqual(metrics["feeds"]["hits"], 1)
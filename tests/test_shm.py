@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from timetables.parser.edupage import EdupageParser, shm
+from timetables.parser.edupage.export import lesson_dict
+from timetables.parser.edupage.shm import DatasetPublisher, DatasetReader
+
+from .fixtures import Edupage, session
+
+
+class DatasetReaderTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.publisher = DatasetPublisher(self.directory, keep=1)
+        self.reader = DatasetReader(self.directory)
+
+    def test_get(self) -> None:
+        self.assertIsNone(self.reader.get("test"))
+        path = self.publisher.publish("test", [])
+        view = self.reader.get("test")
+        self.assertEqual(view.path, path)
+        self.assertIs(self.reader.get("test"), view)
+        self.assertEqual(self.reader.edupages(), ["test"])
+
+    def test_version_removed_while_opening(self) -> None:
+        self.publisher.publish("test", [])
+        paths = []
+        view_class = shm.DatasetView
+
+        def open_view(path: str):
+            if not paths:
+                # another publish removes the version being opened
+                paths.append(self.publisher.publish("test", []))
+                self.assertFalse(os.path.exists(path))
+            return view_class(path)
+
+        with mock.patch.object(shm, "DatasetView", side_effect=open_view):
+            view = self.reader.get("test")
+        self.assertEqual(view.path, paths[0])
+        self.assertIs(self.reader.get("test"), view)
+
+    async def test_round_trip(self) -> None:
+        edupage = Edupage()
+        async with EdupageParser(session(), transport=edupage.transport()) as parser:
+            parser.enqueue_all()
+            lessons = (await parser.run_all()).lessons
+        self.publisher.publish("test", lessons)
+        view = self.reader.get("test")
+        self.assertEqual(len(view), len(lessons))
+        for i, lesson in enumerate(lessons):
+            self.assertEqual(view[i].to_dict(), lesson_dict(lesson))
+        self.assertEqual(
+            [lesson.to_dict() for lesson in view], list(map(lesson_dict, lessons))
+        )
+        with self.assertRaises(IndexError):
+            view[len(lessons)]
+
+        self.assertEqual(view.names("register"), ["1A", "1B"])
+        self.assertEqual(view.names("classroom"), ["101"])
+        self.assertEqual(view.names("teachers"), ["Anna Nowak", "JK"])
+        teachers = [lesson.teachers for lesson in view.lessons("teachers", "JK")]
+        self.assertEqual(teachers, [["JK"], ["Anna Nowak", "JK"]])
+        self.assertEqual(view.lessons("register", "2A"), [])
+        self.assertEqual(
+            [lesson.id for lesson in view.lessons("classroom", "101")],
+            [lessons[0].internal_id],
+        )
@@ -0,0 +1,92 @@
+import gc
+import os
+import unittest
+
+from timetables.parser.edupage import EdupageParser
+
+from .fixtures import Edupage, session
+
+PARSES = 1000
+WARMUP = 100
+# allowed RSS growth between the warm-up and the last parse
+MAX_GROWTH = 8 * 1024 * 1024
+
+
+def school_tables(classes: int = 10, lessons: int = 20) -> dict:
+    """
+    Tables of a school with `lessons` lessons of every class, one card each.
+    """
+    periods = [
+        {
+            "id": str(n),
+            "period": str(n),
+            "starttime": f"{7 + n}:00",
+            "endtime": f"{7 + n}:45",
+        }
+        for n in range(1, 9)
+    ]
+    tables = {
+        "periods": periods,
+        "classes": [],
+        "groups": [],
+        "subjects": [{"id": f"*{i}", "name": f"Subject {i}"} for i in range(1, 11)],
+        "teachers": [{"id": f"*{i}", "short": f"T{i}"} for i in range(1, 21)],
+        "classrooms": [{"id": f"*{i}", "name": str(100 + i)} for i in range(1, 11)],
+        "lessons": [],
+        "cards": [],
+    }
+    for c in range(1, classes + 1):
+        tables["classes"].append({"id": f"*{c}", "name": f"{c}A"})
+        group = {"id": f"*{c}", "classid": f"*{c}", "name": "Cała klasa"}
+        tables["groups"].append(dict(group, entireclass=True))
+        for n in range(lessons):
+            lid = c * 1000 + n
+            tables["lessons"].append(
+                {
+                    "id": f"*{lid}",
+                    "subjectid": f"*{n % 10 + 1}",
+                    "classroomidss": [[f"*{c}"]],
+                    "classids": [f"*{c}"],
+                    "groupids": [f"*{c}"],
+                    "teacherids": [f"*{(c + n) % 20 + 1}"],
+                }
+            )
+            tables["cards"].append(
+                {
+                    "id": f"*{lid}",
+                    "lessonid": f"*{lid}",
+                    "period": str(n % 8 + 1),
+                    "days": "".join("1" if d == n // 8 % 5 else "0" for d in range(5)),
+                }
+            )
+    return tables
+
+
+def rss() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+@unittest.skipUnless(os.path.exists("/proc/self/statm"), "needs /proc (Linux)")
+class SoakTest(unittest.IsolatedAsyncioTestCase):
+    async def parse(self, edupage: str, tables: dict) -> None:
+        parser = EdupageParser(session(edupage), transport=Edupage(tables).transport())
+        async with parser:
+            parser.enqueue_all()
+            ds = await parser.run_all()
+            self.assertEqual(len(ds.lessons), len(tables["cards"]))
+        # all state is released with the context
+        self.assertEqual(parser.cache, {})
+        self.assertEqual(parser.lessons, {})
+        self.assertEqual(parser.index.lessons, [])
+
+    async def test_rss_is_flat(self) -> None:
+        tables = school_tables()
+        for i in range(PARSES):
+            await self.parse(f"school{i}", tables)
+            if i + 1 == WARMUP:
+                gc.collect()
+                baseline = rss()
+        gc.collect()
+        growth = rss() - baseline
+        self.assertLess(growth, MAX_GROWTH, f"RSS grew by {growth} bytes")
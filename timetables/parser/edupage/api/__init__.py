@@ -1,17 +1,47 @@
 from .api import EdupageApi
 from .api_v1 import EdupageApiV1
 from .api_v2 import EdupageApiV2
-from .model import Account, Edupage, LoginError, Portal, Session, SessionExpiredError
+from .hedge import Hedger
+from .limit import AdaptiveLimiter, RateLimiter
+from .model import (
+    Account,
+    Edupage,
+    LoginError,
+    Portal,
+    Session,
+    SessionExpiredError,
+    TimetableVersion,
+)
+from .singleflight import SingleFlight
+from .transport import (
+    AdaptiveTransport,
+    AiohttpTransport,
+    FakeTransport,
+    Http2Transport,
+    Response,
+    Transport,
+)
 
 __all__ = [
     "Account",
+    "AdaptiveLimiter",
+    "AdaptiveTransport",
+    "AiohttpTransport",
     "Edupage",
     "EdupageApi",
     "EdupageApiV1",
     "EdupageApiV2",
+    "FakeTransport",
+    "Hedger",
+    "Http2Transport",
     "LoginError",
     "Portal",
+    "RateLimiter",
+    "Response",
     "Session",
     "SessionExpiredError",
+    "SingleFlight",
+    "TimetableVersion",
+    "Transport",
     "model",
 ]
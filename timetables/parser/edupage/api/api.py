@@ -1,13 +1,13 @@
 import json
 from typing import Optional, Union
 
-from aiohttp import ClientSession
 from bs4 import BeautifulSoup
 
 from .api_v1 import EdupageApiV1
 from .api_v2 import EdupageApiV2
 from .const import URL_EAUTH
 from .model import Account, Edupage, Portal, Session
+from .transport import AiohttpTransport, Transport
 from .utils import mauth_payload
 
 
@@ -15,6 +15,14 @@ class EdupageApi:
     v1: EdupageApiV1
     v2: EdupageApiV2
 
+    def __init__(self, limit: int = 100, transport: Optional[Transport] = None):
+        # a transport passed here may be shared, and is not opened or closed
+        self.own_transport = transport is None
+        # maximum number of simultaneous connections of the default transport
+        self.transport = transport or AiohttpTransport(limit=limit)
+        self.v1 = EdupageApiV1(self.transport)
+        self.v2 = EdupageApiV2(self.transport)
+
     async def eauth(
         self,
         login: str,
@@ -90,12 +98,10 @@ class EdupageApi:
         pass
 
     async def __aenter__(self) -> "EdupageApi":
-        self.session = ClientSession()
-        self.v1 = EdupageApiV1(self.session)
-        self.v2 = EdupageApiV2(self.session)
+        if self.own_transport:
+            await self.transport.open()
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
-        await self.session.close()
-        # await self.v1.session.close()
-        # await self.v2.session.close()
+        if self.own_transport:
+            await self.transport.close()
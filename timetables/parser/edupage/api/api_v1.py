@@ -4,7 +4,6 @@ from datetime import datetime
 from random import randbytes
 from typing import List, Optional, Union
 
-from aiohttp import ClientSession
 from bs4 import BeautifulSoup
 
 from .const import (
@@ -16,13 +15,21 @@ from .const import (
     VERSION_V1_FLASH,
     VERSION_V1_OS,
 )
+from .hedge import Hedger
 from .model import Edupage, LoginError, Portal, Session, SessionExpiredError
+from .singleflight import SingleFlight
+from .transport import Response, Transport
 from .utils import compress_v1, connect_payload, mauth_payload, stringify
 
 
 class EdupageApiV1:
-    def __init__(self, session: ClientSession):
-        self.session = session
+    # shared by all instances, set to None to disable
+    flights: Optional[SingleFlight] = SingleFlight()
+    # shared by all instances, set to a Hedger to hedge slow sync requests
+    hedger: Optional[Hedger] = None
+
+    def __init__(self, transport: Transport):
+        self.transport = transport
 
     @staticmethod
     def _headers() -> dict:
@@ -42,6 +49,17 @@ class EdupageApiV1:
         session: Optional[Session],
         compress: bool = False,
     ) -> str:
+        r = await self._connect_mobile(edupage, action, payload, session, compress)
+        return r.text()
+
+    async def _connect_mobile(
+        self,
+        edupage: Union[Edupage, str],
+        action: Optional[str],
+        payload: dict,
+        session: Optional[Session],
+        compress: bool = False,
+    ) -> Response:
         esid = session.esid if session else ""
         if action:
             eqa = f"akcia={action}&ESID={esid}&hsid=&lang=en"
@@ -54,70 +72,85 @@ class EdupageApiV1:
             payload = compress_v1(payload)
             payload = {"eqap": payload}
         payload["xhrnd"] = randbytes(15).hex()
-        async with self.session.post(
+        return await self.transport.post(
             url,
             params=params,
             data=payload,
             headers=self._headers(),
-        ) as r:
-            return await r.text()
+        )
 
     async def mauth(
         self, login: str, password: str, **kwargs
     ) -> Union[Portal, Session]:
         payload = mauth_payload(login=login, password=password)
-        async with self.session.post(
+        r = await self.transport.post(
             URL_V1_MAUTH,
             data=stringify(payload),
             headers=self._headers(),
-        ) as r:
-            xml = await r.text()
-            doc = BeautifulSoup(xml, "xml")
-            sess = doc.select_one("login")
-            if sess and "status" in sess.attrs and sess["status"] == "fail":
-                raise LoginError()
-            user_id = doc.select_one("userid")
-            user_id = int(user_id.text) if user_id else None
-            sessions = list(
-                map(
-                    lambda edupage: Session(
-                        edupage=edupage["id"],
-                        username=edupage["edumeno"],
-                        password_hash=edupage["eduheslo"],
-                        name_first=edupage["meno"],
-                        name_last=edupage["priezvisko"],
-                        esid=edupage["esid"],
-                        portal_id=user_id,
-                        portal_email=login,
-                    ),
-                    doc.select("edupage"),
-                )
+        )
+        xml = r.text()
+        doc = BeautifulSoup(xml, "xml")
+        sess = doc.select_one("login")
+        if sess and "status" in sess.attrs and sess["status"] == "fail":
+            raise LoginError()
+        user_id = doc.select_one("userid")
+        user_id = int(user_id.text) if user_id else None
+        sessions = list(
+            map(
+                lambda edupage: Session(
+                    edupage=edupage["id"],
+                    username=edupage["edumeno"],
+                    password_hash=edupage["eduheslo"],
+                    name_first=edupage["meno"],
+                    name_last=edupage["priezvisko"],
+                    esid=edupage["esid"],
+                    portal_id=user_id,
+                    portal_email=login,
+                ),
+                doc.select("edupage"),
             )
-            if not sessions:
-                # if mauth returns a single session, it is definitely a single account connected to Portal
-                app_data = json.loads(sess["appdata"])
-                return Session(
-                    edupage=Edupage(
-                        name=sess["edupage"],
-                        country=app_data["edurequestProps"]["school_country"],
-                        school_name=app_data["edurequestProps"]["school_name"],
-                    ),
-                    username=sess["edumeno"],
-                    password_hash=sess["eduheslo"],
-                    name_first=sess["meno"],
-                    name_last=sess["priezvisko"],
-                    esid=sess["session"],
-                    portal_id=None,
-                    portal_email=app_data["email"],
-                )
-            portal = Portal(
-                user_id=user_id,
-                user_email=login,
-                sessions=sessions,
+        )
+        if not sessions:
+            # if mauth returns a single session, it is definitely a single account connected to Portal
+            app_data = json.loads(sess["appdata"])
+            return Session(
+                edupage=Edupage(
+                    name=sess["edupage"],
+                    country=app_data["edurequestProps"]["school_country"],
+                    school_name=app_data["edurequestProps"]["school_name"],
+                ),
+                username=sess["edumeno"],
+                password_hash=sess["eduheslo"],
+                name_first=sess["meno"],
+                name_last=sess["priezvisko"],
+                esid=sess["session"],
+                portal_id=None,
+                portal_email=app_data["email"],
             )
-            return portal
+        portal = Portal(
+            user_id=user_id,
+            user_email=login,
+            sessions=sessions,
+        )
+        return portal
 
     async def sync(self, session: Session, tables: List[str]) -> dict:
+        """
+        Identical concurrent calls (same session and tables) share a single request.
+        The returned dict may thus be shared, and must not be modified.
+        """
+        if self.flights is None:
+            return await self._hedged_sync(session, tables)
+        # responses and errors (e.g. an expired session) depend on the session
+        key = (session.edupage_name(), session.esid, "v1", tuple(sorted(tables)))
+        return await self.flights.run(key, lambda: self._hedged_sync(session, tables))
+
+    async def _hedged_sync(self, session: Session, tables: List[str]) -> dict:
+        if not self.hedger:
+            return await self._sync(session, tables)
+        return await self.hedger.run(lambda: self._sync(session, tables))
+
+    async def _sync(self, session: Session, tables: List[str]) -> dict:
         now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         never = "0000-00-00 00:00:00"
         param_tables = {
@@ -159,10 +192,14 @@ class EdupageApiV1:
             "version": VERSION_V1_APP,
             "osversion": VERSION_V1_OS,
         }
-        data = await self.connect_mobile(
+        r = await self._connect_mobile(
             edupage=edupage,
             action=None,
             payload=payload,
             session=None,
         )
-        return data == "ok"
+        # only a successful response tells that the Edupage does not exist,
+        # other ones (e.g. 429 or 503) are likely to be temporary
+        if not 200 <= r.status < 300:
+            raise ValueError(f"Response status is not OK: HTTP {r.status}")
+        return r.text() == "ok"
@@ -1,8 +1,6 @@
 from hashlib import sha1
 from typing import Dict, List, Optional, Union
 
-from aiohttp import ClientSession
-
 from .const import (
     URL_V2_APPLOGIN,
     URL_V2_MAUTH,
@@ -10,13 +8,21 @@ from .const import (
     USER_AGENT_REACT,
     VERSION_V2_APP,
 )
+from .hedge import Hedger
 from .model import Account, Edupage, LoginError, Portal, Session, SessionExpiredError
+from .singleflight import SingleFlight
+from .transport import Transport
 from .utils import compress_v2, mauth_payload, stringify, sync_payload
 
 
 class EdupageApiV2:
-    def __init__(self, session: ClientSession):
-        self.session = session
+    # shared by all instances, set to None to disable
+    flights: Optional[SingleFlight] = SingleFlight()
+    # shared by all instances, set to a Hedger to hedge slow sync requests
+    hedger: Optional[Hedger] = None
+
+    def __init__(self, transport: Transport):
+        self.transport = transport
 
     @staticmethod
     def _headers() -> dict:
@@ -49,15 +55,15 @@ class EdupageApiV2:
                 "maxEqav": "7",
             }
         )
-        async with self.session.post(
+        r = await self.transport.post(
             url,
             params=params,
             data=form,
             headers=self._headers(),
-        ) as r:
-            if raw:
-                return await r.text()
-            return await r.json(content_type="text/html")
+        )
+        if raw:
+            return r.text()
+        return r.json()
 
     async def app_login(
         self,
@@ -109,12 +115,12 @@ class EdupageApiV2:
                     name_first=user["firstname"],
                     name_last=user["lastname"],
                     esid=user["esid"],
-                    portal_id=user["portal_userid"]
-                    if "portal_userid" in user
-                    else None,
-                    portal_email=user["portal_email"]
-                    if "portal_email" in user
-                    else None,
+                    portal_id=(
+                        user["portal_userid"] if "portal_userid" in user else None
+                    ),
+                    portal_email=(
+                        user["portal_email"] if "portal_email" in user else None
+                    ),
                 ),
                 data["users"],
             )
@@ -129,6 +135,29 @@ class EdupageApiV2:
         )
 
     async def sync(self, session: Session, tables: Dict[str, List[str]]) -> dict:
+        """
+        Identical concurrent calls (same session and tables) share a single request.
+        The returned dict may thus be shared, and must not be modified.
+        """
+        if self.flights is None:
+            return await self._hedged_sync(session, tables)
+        # responses and errors (e.g. an expired session) depend on the session
+        key = (
+            session.edupage_name(),
+            session.esid,
+            "v2",
+            tuple((table, tuple(keys)) for table, keys in sorted(tables.items())),
+        )
+        return await self.flights.run(key, lambda: self._hedged_sync(session, tables))
+
+    async def _hedged_sync(
+        self, session: Session, tables: Dict[str, List[str]]
+    ) -> dict:
+        if not self.hedger:
+            return await self._sync(session, tables)
+        return await self.hedger.run(lambda: self._sync(session, tables))
+
+    async def _sync(self, session: Session, tables: Dict[str, List[str]]) -> dict:
         param_tables = {table: {"keys": keys} for table, keys in tables.items()}
         payload = sync_payload(param_tables, session.edupage)
         url = URL_V2_SYNC.format(session.edupage)
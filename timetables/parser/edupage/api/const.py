@@ -14,6 +14,18 @@ DEVICE_ID = ""
 DEVICE_KEY = ""
 USER_AGENT_AIR = "Mozilla/5.0 (Android; U; en-US) AppleWebKit/533.19.4 (KHTML, like Gecko) AdobeAIR/32.0"
 USER_AGENT_REACT = "Mozilla/5.0 (Linux; Android 10; Redmi Note 6 Pro Build/QQ3A.200905.001; wv) AppleWebKit/537.36 (KHTML, like Gecko) Version/4.0 Chrome/91.0.4472.164 Mobile Safari/537.36"
+ID_STRIP = "* "
+
+TABLES_V2_TIMETABLE = [
+    "periods",
+    "classes",
+    "groups",
+    "subjects",
+    "teachers",
+    "classrooms",
+    "lessons",
+    "cards",
+]
 
 TABLES_V1 = {
     "processestypes": 12960000,
@@ -36,3 +48,15 @@ TABLES_V1 = {
     "upcoming": 12960000,
     "timetableinfos": 0,
 }
+
+# v1 tables holding the same data as v2 timetable tables, to look up their validity
+TABLES_V2_V1 = {
+    "periods": "timetables",
+    "classes": "trieda",
+    "groups": "trieda",
+    "subjects": "predmet",
+    "teachers": "ucitel",
+    "classrooms": "ucebna",
+    "lessons": "timetables",
+    "cards": "timetables",
+}
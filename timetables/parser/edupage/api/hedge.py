@@ -0,0 +1,100 @@
+import asyncio
+from collections import deque
+from time import monotonic
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class Hedger:
+    """
+    Sends a duplicate ("hedged") request when the first one is slower than
+    the `percentile` of recently observed latencies. The first successful
+    response wins, and the other request is cancelled.
+
+    At most `max_rate` of the most recent `window` requests are hedged,
+    which bounds the extra load put on the servers. No request is hedged
+    until `min_samples` latencies are known.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        max_rate: float = 0.05,
+        min_delay: float = 0.5,
+        window: int = 200,
+        min_samples: int = 20,
+    ):
+        self.percentile = percentile
+        self.max_rate = max_rate
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.recent: Deque[bool] = deque(maxlen=window)
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def delay(self) -> Optional[float]:
+        """
+        Time after which a request is hedged, or None if not known yet.
+        """
+        if len(self.latencies) < self.min_samples:
+            return None
+        latencies = sorted(self.latencies)
+        index = min(len(latencies) - 1, int(len(latencies) * self.percentile / 100))
+        return max(latencies[index], self.min_delay)
+
+    def _may_hedge(self) -> bool:
+        return sum(self.recent) < self.max_rate * self.recent.maxlen
+
+    async def _timed(self, func: Callable[[], Awaitable[T]]) -> T:
+        started = monotonic()
+        result = await func()
+        self.latencies.append(monotonic() - started)
+        return result
+
+    async def run(self, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Call `func`, and call it again if the first call is too slow.
+        """
+        self.requests += 1
+        delay = self.delay()
+        primary = asyncio.create_task(self._timed(func))
+        tasks = {primary}
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done and self._may_hedge():
+                    self.hedged += 1
+                    self.recent.append(True)
+                    tasks.add(asyncio.create_task(self._timed(func)))
+                    return await self._first(tasks, primary)
+            self.recent.append(False)
+            return await primary
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _first(self, tasks: set, primary: asyncio.Task) -> Any:
+        pending = set(tasks)
+        while True:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            # prefer a successful response, unless all requests failed
+            succeeded = [task for task in done if not task.exception()]
+            if succeeded:
+                if primary not in succeeded:
+                    self.hedge_wins += 1
+                return succeeded[0].result()
+            if not pending:
+                return done.pop().result()
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(
+            requests=self.requests,
+            hedged=self.hedged,
+            hedge_wins=self.hedge_wins,
+            delay=self.delay(),
+        )
@@ -0,0 +1,121 @@
+import asyncio
+from collections import deque
+from time import monotonic
+from typing import Any, Deque, Dict, Optional
+
+
+class RateLimiter:
+    """
+    Token bucket: allows `rate` requests per second on average,
+    with bursts of up to `burst` requests.
+    """
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        tokens = min(tokens, self.burst)
+        # the lock keeps the waiters in FIFO order
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+
+class AdaptiveLimiter:
+    """
+    Limits the number of requests in flight, adjusting the limit with AIMD:
+    - every healthy response (faster than `latency_target`) raises the limit
+      by `increase` per `limit` responses (i.e. by `increase` per round trip),
+    - every overload signal (timeout, connection error, 5xx, 429) multiplies
+      the limit by `decrease`, at most once per round trip.
+
+    The limit stays between `min_limit` and `max_limit`.
+    """
+
+    def __init__(
+        self,
+        initial: float = 4.0,
+        min_limit: float = 1.0,
+        max_limit: float = 100.0,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        latency_target: float = 5.0,
+        window: int = 1000,
+    ):
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self.successes = 0
+        self.failures = 0
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self._decreased_at = 0.0
+        self._changed = asyncio.Condition()
+
+    async def acquire(self) -> float:
+        """
+        Wait for a free slot. Returns the start time, to pass to release().
+        """
+        async with self._changed:
+            while self.in_flight >= int(self.limit):
+                await self._changed.wait()
+            self.in_flight += 1
+        return monotonic()
+
+    async def release(self, started: float, overloaded: Optional[bool] = False) -> None:
+        """
+        Free the slot, adjusting the limit unless `overloaded` is None
+        (i.e. the request was not completed, e.g. cancelled).
+        """
+        if overloaded is not None:
+            self._observe(started, overloaded)
+        async with self._changed:
+            self.in_flight -= 1
+            self._changed.notify_all()
+
+    def _observe(self, started: float, overloaded: bool) -> None:
+        latency = monotonic() - started
+        self.latencies.append(latency)
+        if overloaded:
+            self.failures += 1
+            # requests started before the last decrease reflect the old limit
+            if started >= self._decreased_at:
+                self.limit = max(self.min_limit, self.limit * self.decrease)
+                self._decreased_at = monotonic()
+            return
+        self.successes += 1
+        if latency <= self.latency_target:
+            self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))]
+
+    def stats(self) -> Dict[str, Any]:
+        result = dict(
+            limit=self.limit,
+            in_flight=self.in_flight,
+            successes=self.successes,
+            failures=self.failures,
+        )
+        for p in (50, 90, 99):
+            latency = self.percentile(p)
+            result[f"p{p}_ms"] = latency * 1000 if latency is not None else None
+        return result
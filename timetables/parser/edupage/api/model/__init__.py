@@ -3,6 +3,7 @@ from .edupage import Edupage
 from .exception import LoginError, SessionExpiredError
 from .portal import Portal
 from .session import Session
+from .timetable import TimetableVersion
 
 __all__ = [
     "Account",
@@ -11,4 +12,5 @@ __all__ = [
     "Portal",
     "Session",
     "SessionExpiredError",
+    "TimetableVersion",
 ]
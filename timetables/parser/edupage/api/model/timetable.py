@@ -0,0 +1,19 @@
+from datetime import date
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel
+
+
+class TimetableVersion(BaseModel):
+    id: str
+    name: str = ""
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    tables: Dict[str, Any] = {}
+
+    def is_valid(self, day: date) -> bool:
+        if self.date_from and day < self.date_from:
+            return False
+        if self.date_to and day > self.date_to:
+            return False
+        return True
@@ -0,0 +1,269 @@
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Union
+from urllib.parse import urlencode, urlparse
+
+from aiohttp import ClientSession, TCPConnector
+
+from .limit import AdaptiveLimiter
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+Data = Union[dict, str, None]
+
+
+class Request(NamedTuple):
+    url: str
+    params: Optional[dict]
+    data: Data
+    headers: Optional[dict]
+
+
+class Response:
+    """
+    A fully read HTTP response.
+    """
+
+    def __init__(self, status: int, body: bytes, encoding: Optional[str] = None):
+        self.status = status
+        self.body = body
+        self.encoding = encoding or "utf-8"
+
+    def text(self) -> str:
+        return self.body.decode(self.encoding, errors="replace")
+
+    def json(self) -> Any:
+        # Edupage responds with JSON served as text/html, so the type is not checked
+        return json.loads(self.body)
+
+
+class Transport(ABC):
+    """
+    Sends HTTP requests on behalf of the API classes.
+
+    A single transport may be shared by many EdupageApi instances (e.g. one
+    per parsed school); it is then opened and closed by its owner only.
+    """
+
+    @abstractmethod
+    async def post(
+        self,
+        url: str,
+        params: Optional[dict] = None,
+        data: Data = None,
+        headers: Optional[dict] = None,
+    ) -> Response:
+        """Send a POST request and read the whole response."""
+
+    async def open(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def __aenter__(self) -> "Transport":
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
+
+
+class AiohttpTransport(Transport):
+    """
+    HTTP/1.1 transport, keeping up to `limit` connections open.
+    """
+
+    def __init__(self, limit: int = 100):
+        self.limit = limit
+        self.session: Optional[ClientSession] = None
+
+    async def open(self) -> None:
+        if self.session is None:
+            self.session = ClientSession(connector=TCPConnector(limit=self.limit))
+
+    async def post(
+        self,
+        url: str,
+        params: Optional[dict] = None,
+        data: Data = None,
+        headers: Optional[dict] = None,
+    ) -> Response:
+        await self.open()
+        async with self.session.post(
+            url,
+            params=params,
+            data=data,
+            headers=headers,
+        ) as r:
+            return Response(r.status, await r.read(), r.charset)
+
+    async def close(self) -> None:
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+
+class Http2Transport(Transport):
+    """
+    HTTP/2 transport, multiplexing concurrent requests to the same host
+    over a single connection. Requires the http2 extra (httpx[http2]).
+    """
+
+    def __init__(self, limit: int = 10):
+        if httpx is None:
+            raise RuntimeError("Http2Transport requires httpx[http2]")
+        self.limit = limit
+        self.client: Optional["httpx.AsyncClient"] = None
+
+    async def open(self) -> None:
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                http2=True,
+                limits=httpx.Limits(max_connections=self.limit),
+                timeout=httpx.Timeout(60.0),
+            )
+
+    async def post(
+        self,
+        url: str,
+        params: Optional[dict] = None,
+        data: Data = None,
+        headers: Optional[dict] = None,
+    ) -> Response:
+        await self.open()
+        if isinstance(data, str):
+            r = await self.client.post(
+                url, params=params, content=data.encode(), headers=headers
+            )
+        else:
+            r = await self.client.post(url, params=params, data=data, headers=headers)
+        return Response(r.status_code, r.content, r.charset_encoding)
+
+    async def close(self) -> None:
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+
+
+class FakeTransport(Transport):
+    """
+    In-process transport for tests. Responses are looked up by URL
+    (without the query string), or produced by `handler`.
+
+    A response may be a Response, a str or bytes body, or a dict/list
+    sent as JSON. All requests are recorded in `requests`.
+    """
+
+    def __init__(
+        self,
+        responses: Optional[Dict[str, Any]] = None,
+        handler: Optional[Callable[[Request], Any]] = None,
+    ):
+        self.responses = dict(responses or {})
+        self.handler = handler
+        self.requests: List[Request] = []
+
+    def add(self, url: str, response: Any) -> None:
+        self.responses[url] = response
+
+    @staticmethod
+    def _response(response: Any) -> Response:
+        if isinstance(response, Response):
+            return response
+        if isinstance(response, str):
+            response = response.encode()
+        elif not isinstance(response, bytes):
+            response = json.dumps(response).encode()
+        return Response(200, response)
+
+    async def post(
+        self,
+        url: str,
+        params: Optional[dict] = None,
+        data: Data = None,
+        headers: Optional[dict] = None,
+    ) -> Response:
+        request = Request(url, params, data, headers)
+        self.requests.append(request)
+        if url in self.responses:
+            return self._response(self.responses[url])
+        if self.handler:
+            return self._response(self.handler(request))
+        query = f"?{urlencode(params)}" if params else ""
+        return Response(404, f"No fake response for {url}{query}".encode())
+
+
+class AdaptiveTransport(Transport):
+    """
+    Wraps another transport, adapting the number of requests in flight
+    to what the servers can handle, both globally and per host
+    (see AdaptiveLimiter).
+
+    `limiter_kwargs` are passed to every AdaptiveLimiter.
+    """
+
+    def __init__(
+        self,
+        transport: Optional[Transport] = None,
+        max_limit: float = 200.0,
+        host_max_limit: float = 20.0,
+        **limiter_kwargs,
+    ):
+        self.transport = transport or AiohttpTransport(limit=int(max_limit))
+        self.host_max_limit = host_max_limit
+        self.limiter_kwargs = limiter_kwargs
+        self.limiter = AdaptiveLimiter(max_limit=max_limit, **limiter_kwargs)
+        self.hosts: Dict[str, AdaptiveLimiter] = {}
+
+    def _host(self, url: str) -> AdaptiveLimiter:
+        host = urlparse(url).netloc
+        if host not in self.hosts:
+            self.hosts[host] = AdaptiveLimiter(
+                max_limit=self.host_max_limit, **self.limiter_kwargs
+            )
+        return self.hosts[host]
+
+    async def post(
+        self,
+        url: str,
+        params: Optional[dict] = None,
+        data: Data = None,
+        headers: Optional[dict] = None,
+    ) -> Response:
+        host = self._host(url)
+        await host.acquire()
+        try:
+            # latency is measured from here, excluding the time spent waiting
+            started = await self.limiter.acquire()
+        except BaseException:
+            await host.release(0.0, None)
+            raise
+        overloaded = True
+        try:
+            response = await self.transport.post(url, params, data, headers)
+            overloaded = response.status >= 500 or response.status == 429
+            return response
+        except asyncio.CancelledError:
+            # not a sign of overload, nor a completed request
+            overloaded = None
+            raise
+        finally:
+            await self.limiter.release(started, overloaded)
+            await host.release(started, overloaded)
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(
+            limiter=self.limiter.stats(),
+            hosts={host: limiter.stats() for host, limiter in self.hosts.items()},
+        )
+
+    async def open(self) -> None:
+        await self.transport.open()
+
+    async def close(self) -> None:
+        await self.transport.close()
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, TypeVar, Union
+
+from .api import Account, EdupageApi, Portal, Session
+from .api.limit import RateLimiter
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def read_names(path: str) -> List[str]:
+    """
+    Read Edupage names from a file, one per line. Empty lines and comments
+    (#) are skipped, as well as duplicates.
+    """
+    with open(path, "r") as f:
+        names = (line.split("#")[0].strip().lower() for line in f)
+        return list(dict.fromkeys(name for name in names if name))
+
+
+def write_json_atomic(path: str, data: Any) -> None:
+    # write to a (uniquely named) temporary file first,
+    # so that the file is never left half-written
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+class MissingCache:
+    """
+    Remembers Edupage names which do not exist, for `ttl` seconds.
+    """
+
+    def __init__(self, path: str = "edupage_missing.json", ttl: float = 7 * 86400):
+        self.path = path
+        self.ttl = ttl
+        self.missing: Dict[str, float] = {}
+        if path and os.path.isfile(path):
+            with open(path, "r") as f:
+                self.missing = json.load(f)
+
+    def __contains__(self, name: str) -> bool:
+        checked_at = self.missing.get(name)
+        return checked_at is not None and checked_at + self.ttl > time.time()
+
+    def add(self, name: str) -> None:
+        self.missing[name] = time.time()
+
+    def discard(self, name: str) -> None:
+        self.missing.pop(name, None)
+
+    def save(self) -> None:
+        if self.path:
+            now = time.time()
+            missing = {k: v for k, v in self.missing.items() if v + self.ttl > now}
+            write_json_atomic(self.path, missing)
+
+
+async def _run_all(
+    names: Iterable[str],
+    func: Callable[[str], Awaitable[T]],
+    concurrency: int,
+    rate: float,
+) -> Dict[str, Union[T, Exception]]:
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(rate, burst=concurrency)
+
+    async def run(name: str) -> Union[T, Exception]:
+        async with semaphore:
+            await limiter.acquire()
+            try:
+                return await func(name)
+            except Exception as e:
+                log.warning(f"'{name}' failed: {e!r}")
+                return e
+
+    names = list(names)
+    results = await asyncio.gather(*(run(name) for name in names))
+    return dict(zip(names, results))
+
+
+async def check_many(
+    api: EdupageApi,
+    names: Iterable[str],
+    concurrency: int = 20,
+    rate: float = 10.0,
+    missing: MissingCache = None,
+) -> Dict[str, Union[bool, Exception]]:
+    """
+    Check whether Edupages exist, running up to `concurrency` checks
+    at once, starting at most `rate` checks per second.
+
+    Names found in the `missing` cache are not checked again.
+    """
+    names = list(names)
+    results = {}
+    if missing:
+        results = {name: False for name in names if name in missing}
+        names = [name for name in names if name not in results]
+    results.update(await _run_all(names, api.v1.check_edupage, concurrency, rate))
+    if missing:
+        for name in names:
+            if results[name] is False:
+                missing.add(name)
+            elif results[name] is True:
+                missing.discard(name)
+        missing.save()
+    return results
+
+
+async def join_many(
+    api: EdupageApi,
+    portal: Portal,
+    names: Iterable[str],
+    concurrency: int = 5,
+    rate: float = 2.0,
+) -> Dict[str, Union[Session, Exception]]:
+    """
+    Join the Portal account to many Edupages, and log in to each created account.
+
+    Edupages already joined are skipped. The new sessions are added
+    to the Portal's sessions.
+    """
+    joined = {str(session.edupage) for session in portal.sessions}
+
+    async def join(name: str) -> Session:
+        account: Account = await api.v2.join_account(portal, name)
+        return await api.login(**account.dict())
+
+    names = [name for name in names if name not in joined]
+    results = await _run_all(names, join, concurrency, rate)
+    for result in results.values():
+        if isinstance(result, Session):
+            portal.sessions.append(result)
+    return results
@@ -0,0 +1,12 @@
+from .base import CacheBackend
+from .file import FileCache
+from .redis import RedisCache, RedisError
+from .sqlite import SqliteCache
+
+__all__ = [
+    "CacheBackend",
+    "FileCache",
+    "RedisCache",
+    "RedisError",
+    "SqliteCache",
+]
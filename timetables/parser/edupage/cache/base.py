@@ -0,0 +1,42 @@
+import json
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, Optional
+
+
+def encode(value: Any) -> bytes:
+    return zlib.compress(json.dumps(value, separators=(",", ":")).encode())
+
+
+def decode(data: bytes) -> Any:
+    return json.loads(zlib.decompress(data))
+
+
+class CacheBackend(ABC):
+    """
+    A key-value store for fetched table data, possibly shared between processes
+    or machines. Values are JSON-serializable and stored compressed.
+    """
+
+    @abstractmethod
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Return the values of all existing, non-expired keys."""
+
+    @abstractmethod
+    async def put_many(self, items: Dict[str, Any], ttl: Optional[int] = None) -> None:
+        """Store all items, expiring after ttl seconds (or never)."""
+
+    async def get(self, key: str) -> Optional[Any]:
+        return (await self.get_many([key])).get(key)
+
+    async def put(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        await self.put_many({key: value}, ttl=ttl)
+
+    async def close(self) -> None:
+        pass
+
+    async def __aenter__(self) -> "CacheBackend":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
@@ -0,0 +1,67 @@
+import asyncio
+import os
+import struct
+import tempfile
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from .base import CacheBackend, decode, encode
+
+# expiry timestamp (0 = never) stored before the compressed value
+HEADER = struct.Struct("<d")
+
+
+class FileCache(CacheBackend):
+    """
+    Stores every key in a separate file in a local (or network-mounted) directory.
+    """
+
+    def __init__(self, directory: str = ".edupage_cache"):
+        self.directory = directory
+
+    def _path(self, key: str) -> str:
+        parts = [part for part in key.split("/") if part not in ("", ".", "..")]
+        return os.path.join(self.directory, *parts) + ".json.z"
+
+    def _read(self, key: str) -> Optional[Any]:
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        (expires,) = HEADER.unpack_from(data)
+        if expires and expires < time.time():
+            return None
+        return decode(data[HEADER.size :])
+
+    def _write(self, key: str, value: Any, expires: float) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temporary file first, so that readers never see partial data;
+        # its name is unique, as other threads may write the same key
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            # mkstemp() creates files readable only by their owner
+            os.fchmod(fd, 0o644)
+            with os.fdopen(fd, "wb") as f:
+                f.write(HEADER.pack(expires))
+                f.write(encode(value))
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def _get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        values = {key: self._read(key) for key in keys}
+        return {key: value for key, value in values.items() if value is not None}
+
+    def _put_many(self, items: Dict[str, Any], ttl: Optional[int]) -> None:
+        expires = time.time() + ttl if ttl else 0
+        for key, value in items.items():
+            self._write(key, value, expires)
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        return await asyncio.to_thread(self._get_many, list(keys))
+
+    async def put_many(self, items: Dict[str, Any], ttl: Optional[int] = None) -> None:
+        await asyncio.to_thread(self._put_many, items, ttl)
@@ -0,0 +1,126 @@
+import asyncio
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+from .base import CacheBackend, decode, encode
+
+
+class RedisError(Exception):
+    pass
+
+
+def _pack(*args: Union[str, bytes, int]) -> bytes:
+    out = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode()
+        out.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(out)
+
+
+class RedisCache(CacheBackend):
+    """
+    Stores keys in any server speaking the Redis protocol (RESP),
+    e.g. Redis, KeyDB, Valkey or DragonflyDB.
+    """
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 6379,
+        db: int = 0,
+        password: Optional[str] = None,
+        prefix: str = "edupage:",
+    ):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.prefix = prefix
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+
+    async def _read_reply(self) -> Any:
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by the server")
+        kind, value = line[:1], line[1:-2]
+        if kind == b"+":
+            return value.decode()
+        if kind == b"-":
+            # returned, not raised, to keep reading the pipelined replies
+            return RedisError(value.decode())
+        if kind == b":":
+            return int(value)
+        if kind == b"$":
+            length = int(value)
+            if length == -1:
+                return None
+            return (await self._reader.readexactly(length + 2))[:-2]
+        if kind == b"*":
+            length = int(value)
+            if length == -1:
+                return None
+            return [await self._read_reply() for _ in range(length)]
+        raise ConnectionError(f"Unknown reply: {line!r}")
+
+    async def _execute(self, commands: Sequence[Sequence]) -> List[Any]:
+        async with self._lock:
+            setup = []
+            try:
+                if not self._writer:
+                    self._reader, self._writer = await asyncio.open_connection(
+                        self.host, self.port
+                    )
+                    if self.password:
+                        setup.append(("AUTH", self.password))
+                    if self.db:
+                        setup.append(("SELECT", self.db))
+                commands = setup + list(commands)
+                # pipeline all commands, then read all replies
+                self._writer.write(b"".join(_pack(*command) for command in commands))
+                await self._writer.drain()
+                replies = [await self._read_reply() for _ in commands]
+            except BaseException:
+                # replies left unread (e.g. when cancelled) would be read
+                # by the next command, so the connection can't be reused
+                await self.close()
+                raise
+            for reply in replies[: len(setup)]:
+                if isinstance(reply, RedisError):
+                    # the next command would use a connection without AUTH/SELECT
+                    await self.close()
+                    raise reply
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies[len(setup) :]
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        (values,) = await self._execute([("MGET", *(self.prefix + k for k in keys))])
+        return {
+            key: decode(value) for key, value in zip(keys, values) if value is not None
+        }
+
+    async def put_many(self, items: Dict[str, Any], ttl: Optional[int] = None) -> None:
+        if not items:
+            return
+        if ttl:
+            commands = [
+                ("SET", self.prefix + key, encode(value), "EX", ttl)
+                for key, value in items.items()
+            ]
+        else:
+            args = []
+            for key, value in items.items():
+                args += [self.prefix + key, encode(value)]
+            commands = [("MSET", *args)]
+        await self._execute(commands)
+
+    async def close(self) -> None:
+        if self._writer:
+            self._writer.close()
+            self._reader = self._writer = None
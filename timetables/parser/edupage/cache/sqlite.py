@@ -0,0 +1,62 @@
+import asyncio
+import sqlite3
+import time
+from contextlib import closing
+from typing import Any, Dict, Iterable, List, Optional
+
+from .base import CacheBackend, decode, encode
+
+# keep below SQLITE_MAX_VARIABLE_NUMBER
+CHUNK_SIZE = 500
+
+
+class SqliteCache(CacheBackend):
+    """
+    Stores all keys in a single SQLite database, in WAL mode, so that
+    many processes can read concurrently while one of them writes.
+    """
+
+    def __init__(self, path: str = "edupage_cache.db", timeout: float = 30.0):
+        self.path = path
+        self.timeout = timeout
+        with closing(self._connect()) as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)"
+            )
+            db.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=self.timeout)
+
+    def _get_many(self, keys: List[str]) -> Dict[str, Any]:
+        result = {}
+        now = time.time()
+        with closing(self._connect()) as db:
+            for i in range(0, len(keys), CHUNK_SIZE):
+                chunk = keys[i : i + CHUNK_SIZE]
+                rows = db.execute(
+                    f"SELECT key, value FROM cache "
+                    f"WHERE key IN ({','.join('?' * len(chunk))}) "
+                    f"AND (expires IS NULL OR expires > ?)",
+                    [*chunk, now],
+                )
+                for key, value in rows:
+                    result[key] = decode(value)
+        return result
+
+    def _put_many(self, items: Dict[str, Any], ttl: Optional[int]) -> None:
+        expires = time.time() + ttl if ttl else None
+        with closing(self._connect()) as db:
+            db.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                [(key, encode(value), expires) for key, value in items.items()],
+            )
+            db.commit()
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        return await asyncio.to_thread(self._get_many, list(keys))
+
+    async def put_many(self, items: Dict[str, Any], ttl: Optional[int] = None) -> None:
+        await asyncio.to_thread(self._put_many, items, ttl)
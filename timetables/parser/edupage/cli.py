@@ -2,9 +2,23 @@ import argparse
 import asyncio
 import json
 import os
-
-from timetables.parser.edupage.api import EdupageApi, Portal
+import sys
+from typing import Optional
+
+from timetables.parser.edupage import bulk
+from timetables.parser.edupage.api import (
+    AdaptiveTransport,
+    EdupageApi,
+    Http2Transport,
+    Portal,
+    Session,
+    Transport,
+)
+from timetables.parser.edupage.deadline import RunResult
+from timetables.parser.edupage.export import LessonWriter
+from timetables.parser.edupage.jobs import Job, SqliteJobQueue, Worker
 from timetables.parser.edupage.parser import EdupageParser
+from timetables.parser.edupage.shm import DatasetPublisher
 
 parser = argparse.ArgumentParser(description="Edupage Parser CLI.")
 subparsers = parser.add_subparsers(help="command", required=True, dest="command")
@@ -12,6 +26,15 @@ subparsers = parser.add_subparsers(help="command", required=True, dest="command"
 parser_check = subparsers.add_parser(name="check")
 parser_check.add_argument("edupage", type=str, help="Edupage name")
 
+parser_check_many = subparsers.add_parser(name="check-many")
+parser_check_many.add_argument("file", type=str, help="File with Edupage names")
+parser_check_many.add_argument(
+    "--concurrency", type=int, help="Parallel requests", default=20
+)
+parser_check_many.add_argument(
+    "--rate", type=float, help="Requests per second", default=10.0
+)
+
 parser_register = subparsers.add_parser(name="register")
 
 parser_login = subparsers.add_parser(name="login")
@@ -21,11 +44,114 @@ parser_login.add_argument("password", type=str, help="Password")
 parser_join = subparsers.add_parser(name="join")
 parser_join.add_argument("edupage", type=str, help="Edupage name")
 
+parser_join_many = subparsers.add_parser(name="join-many")
+parser_join_many.add_argument("file", type=str, help="File with Edupage names")
+parser_join_many.add_argument(
+    "--concurrency", type=int, help="Parallel requests", default=5
+)
+parser_join_many.add_argument(
+    "--rate", type=float, help="Requests per second", default=2.0
+)
+
 parser_parse = subparsers.add_parser(name="parse")
 parser_parse.add_argument("edupage", type=str, help="Edupage name")
 parser_parse.add_argument(
     "--register", type=str, help="Class name", required=False, default=""
 )
+parser_parse.add_argument(
+    "--format",
+    type=str,
+    help="Output format",
+    choices=LessonWriter.FORMATS,
+    required=False,
+    default="text",
+)
+parser_parse.add_argument(
+    "--output",
+    type=str,
+    help="Output file (default: standard output)",
+    required=False,
+    default=None,
+)
+parser_parse.add_argument(
+    "--profile",
+    type=str,
+    help="Write a CPU/memory profile report to this file",
+    required=False,
+    default=None,
+)
+
+parser_serve = subparsers.add_parser(name="serve")
+parser_serve.add_argument(
+    "--host", type=str, help="Listen address", default="127.0.0.1"
+)
+parser_serve.add_argument("--port", type=int, help="Listen port", default=8080)
+parser_serve.add_argument(
+    "--max-memory", type=int, help="Memory limit for datasets [MiB]", default=256
+)
+parser_serve.add_argument(
+    "--fresh-for",
+    type=float,
+    help="Time to serve data without refreshing [s]",
+    default=3600,
+)
+parser_serve.add_argument(
+    "--max-stale",
+    type=float,
+    help="Time to serve stale data while refreshing [s]",
+    default=86400,
+)
+parser_serve.add_argument(
+    "--http2",
+    action="store_true",
+    help="Multiplex requests over HTTP/2 (requires httpx[http2])",
+)
+parser_serve.add_argument(
+    "--adaptive",
+    action="store_true",
+    help="Adapt the number of concurrent Edupage requests to their latency and errors",
+)
+
+parser_coordinate = subparsers.add_parser(name="coordinate")
+parser_coordinate.add_argument(
+    "--queue", type=str, help="Job queue database", default="edupage_jobs.db"
+)
+parser_coordinate.add_argument(
+    "--v1-teachers",
+    action="store_true",
+    help="Fetch full teacher names from the v1 API",
+)
+
+parser_worker = subparsers.add_parser(name="worker")
+parser_worker.add_argument(
+    "--queue", type=str, help="Job queue database", default="edupage_jobs.db"
+)
+parser_worker.add_argument(
+    "--concurrency", type=int, help="Parallel parsed schools", default=4
+)
+parser_worker.add_argument(
+    "--output",
+    type=str,
+    help="Write lessons of every school to <edupage>.ndjson in this directory",
+    default=None,
+)
+parser_worker.add_argument(
+    "--publish",
+    type=str,
+    help="Publish lessons of every school for DatasetReaders in this directory",
+    default=None,
+)
+parser_worker.add_argument(
+    "--budget",
+    type=float,
+    help="Time budget of every school [s], optional stages are skipped when short",
+    default=None,
+)
+parser_worker.add_argument(
+    "--until-empty",
+    action="store_true",
+    help="Exit when no job is due, instead of waiting for more",
+)
 
 if os.name == "nt":
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
@@ -40,6 +166,18 @@ async def a_check(edupage: str):
             print(f"Edupage '{edupage}' does NOT exist.")
 
 
+async def a_check_many(path: str, concurrency: int, rate: float):
+    names = bulk.read_names(path)
+    async with EdupageApi(limit=concurrency) as api:
+        results = await bulk.check_many(
+            api, names, concurrency=concurrency, rate=rate, missing=bulk.MissingCache()
+        )
+    existing = [name for name, exists in results.items() if exists is True]
+    errors = [name for name, exists in results.items() if isinstance(exists, Exception)]
+    print("\n".join(existing))
+    print(f"{len(existing)} of {len(names)} Edupages exist, {len(errors)} errors.")
+
+
 async def a_register():
     async with EdupageApi() as api:
         await api.register_interactive()
@@ -65,35 +203,109 @@ async def a_join(edupage: str):
         print("Re-login to use the session")
 
 
-async def a_parse(edupage: str, register_name: str):
+async def a_join_many(path: str, concurrency: int, rate: float):
+    names = bulk.read_names(path)
+    with open("edupage.json", "r") as f:
+        portal = Portal(**json.load(f))
+    print(f"Logged in as '{portal.user_email}'")
+    async with EdupageApi(limit=concurrency) as api:
+        results = await bulk.join_many(
+            api, portal, names, concurrency=concurrency, rate=rate
+        )
+    joined = [name for name, result in results.items() if isinstance(result, Session)]
+    # save all new sessions at once
+    bulk.write_json_atomic("edupage.json", portal.dict())
+    print(f"Joined {len(joined)} of {len(results)} new Edupages.")
+    print("Sessions saved to edupage.json")
+
+
+async def a_parse(
+    edupage: str,
+    register_name: str,
+    profile_file: str = None,
+    output_format: str = "text",
+    output_file: str = None,
+):
     with open("edupage.json", "r") as f:
         portal = Portal(**json.load(f))
     session = portal.get_session(edupage)
-    async with EdupageParser(session, enable_cache=True) as edupage:
+    async with EdupageParser(
+        session, enable_cache=True, profile_file=profile_file
+    ) as edupage:
         edupage.enqueue_all()
-        ds = await edupage.run_all()
-        lessons = sorted(ds.lessons, key=lambda x: (x.weekday, x.number))
+        await edupage.run_all()
         if register_name:
-            print(
-                "\n".join(str(s) for s in lessons if s.register_.name == register_name)
-            )
+            lessons = edupage.index.register(register_name)
         else:
-            for lesson in lessons:
-                print(str(lesson))
+            lessons = edupage.index.lessons
+        if output_file:
+            with open(output_file, "w", encoding="utf-8", newline="") as f:
+                LessonWriter(f, output_format).write(lessons)
+        else:
+            LessonWriter(sys.stdout, output_format).write(lessons)
+            sys.stdout.flush()
+
+
+async def a_coordinate(queue_path: str, v1_teachers: bool):
+    with open("edupage.json", "r") as f:
+        portal = Portal(**json.load(f))
+    async with SqliteJobQueue(queue_path) as queue:
+        ids = await queue.put_many(portal.sessions, dict(try_v1_teachers=v1_teachers))
+        print(f"Queued {len(ids)} schools.")
+        print(await queue.stats())
+
+
+async def a_worker(
+    queue_path: str,
+    concurrency: int,
+    output_dir: str,
+    publish_dir: str,
+    budget: float,
+    until_empty: bool,
+):
+    publisher = DatasetPublisher(publish_dir) if publish_dir else None
+
+    async def on_result(job: Job, result: RunResult) -> None:
+        ds = result.ds
+        partial = f", skipped {', '.join(result.skipped)}" if result.partial else ""
+        print(f"{job.edupage}: {len(ds.lessons)} lessons{partial}")
+        if output_dir:
+            path = os.path.join(output_dir, f"{job.edupage}.ndjson")
+            with open(path, "w", encoding="utf-8") as f:
+                LessonWriter(f, "ndjson").write(ds.lessons)
+        if publisher:
+            publisher.publish(job.edupage, ds.lessons)
+
+    async with SqliteJobQueue(queue_path) as queue:
+        worker = Worker(
+            queue, on_result=on_result, concurrency=concurrency, budget=budget
+        )
+        await worker.run(until_empty=until_empty)
+        print(f"Parsed {worker.processed} schools, {worker.failed} failed.")
 
 
 def main():
     args = parser.parse_args()
     if args.command == "check":
         check(args)
+    elif args.command == "check-many":
+        check_many(args)
     elif args.command == "register":
         register()
     elif args.command == "login":
         login(args)
     elif args.command == "join":
         join(args)
+    elif args.command == "join-many":
+        join_many(args)
     elif args.command == "parse":
         parse(args)
+    elif args.command == "serve":
+        serve(args)
+    elif args.command == "coordinate":
+        coordinate(args)
+    elif args.command == "worker":
+        worker(args)
 
 
 def check(args=None):
@@ -102,6 +314,12 @@ def check(args=None):
     asyncio.run(a_check(args.edupage))
 
 
+def check_many(args=None):
+    if not args:
+        args = parser_check_many.parse_args()
+    asyncio.run(a_check_many(args.file, args.concurrency, args.rate))
+
+
 def register():
     asyncio.run(a_register())
 
@@ -118,10 +336,71 @@ def join(args=None):
     asyncio.run(a_join(args.edupage))
 
 
+def join_many(args=None):
+    if not args:
+        args = parser_join_many.parse_args()
+    asyncio.run(a_join_many(args.file, args.concurrency, args.rate))
+
+
 def parse(args=None):
     if not args:
         args = parser_parse.parse_args()
-    asyncio.run(a_parse(args.edupage, args.register))
+    asyncio.run(
+        a_parse(
+            args.edupage,
+            args.register,
+            args.profile,
+            args.format,
+            args.output,
+        )
+    )
+
+
+def _transport(http2: bool, adaptive: bool) -> Optional[Transport]:
+    transport = Http2Transport() if http2 else None
+    if adaptive:
+        transport = AdaptiveTransport(transport)
+    return transport
+
+
+def serve(args=None):
+    # aiohttp.web is only needed here
+    from timetables.parser.edupage.server import run_server
+
+    if not args:
+        args = parser_serve.parse_args()
+    with open("edupage.json", "r") as f:
+        portal = Portal(**json.load(f))
+    run_server(
+        portal,
+        host=args.host,
+        port=args.port,
+        max_memory=args.max_memory * 1024 * 1024,
+        fresh_for=args.fresh_for,
+        max_stale=args.max_stale,
+        transport=_transport(args.http2, args.adaptive),
+    )
+
+
+def coordinate(args=None):
+    if not args:
+        args = parser_coordinate.parse_args()
+    asyncio.run(a_coordinate(args.queue, args.v1_teachers))
+
+
+def worker(args=None):
+    if not args:
+        args = parser_worker.parse_args()
+    asyncio.run(
+        a_worker(
+            args.queue,
+            args.concurrency,
+            args.output,
+            args.publish,
+            args.budget,
+            args.until_empty,
+        )
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,45 @@
+import asyncio
+from time import monotonic
+from typing import Any, NamedTuple, Tuple
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    pass
+
+
+class StageSkipped(Exception):
+    pass
+
+
+class RunResult(NamedTuple):
+    """
+    A parsed dataset, with the optional stages skipped because of the deadline.
+    """
+
+    ds: Any
+    skipped: Tuple[str, ...] = ()
+
+    @property
+    def partial(self) -> bool:
+        return bool(self.skipped)
+
+
+class Deadline:
+    """
+    A time budget of `budget` seconds, starting when created.
+    """
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.expires = monotonic() + budget
+
+    def remaining(self) -> float:
+        return max(self.expires - monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return monotonic() >= self.expires
+
+    def check(self, what: str = "") -> None:
+        if self.expired:
+            raise DeadlineExceeded(f"Deadline of {self.budget}s exceeded {what}")
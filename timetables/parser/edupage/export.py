@@ -0,0 +1,86 @@
+import csv
+import json
+from datetime import time
+from itertools import islice
+from typing import Any, Dict, Iterable, Optional, TextIO
+
+from timetables.schemas import Lesson
+
+
+def _time(value: Optional[time]) -> Optional[str]:
+    return value.strftime("%H:%M") if value else None
+
+
+def _name(value: Any) -> Optional[str]:
+    return value.name if value else None
+
+
+def lesson_dict(lesson: Lesson) -> Dict[str, Any]:
+    """
+    A flat, JSON-serializable representation of a lesson.
+    """
+    return {
+        "id": lesson.internal_id,
+        "weekday": lesson.weekday.value,
+        "number": lesson.number,
+        "time_start": _time(lesson.time_start),
+        "time_end": _time(lesson.time_end),
+        "register": _name(lesson.register_),
+        "team": _name(lesson.team),
+        "subject": _name(lesson.subject),
+        "teachers": [teacher.name for teacher in lesson.teachers],
+        "classroom": _name(lesson.classroom),
+    }
+
+
+class LessonWriter:
+    """
+    Writes lessons to a stream, as text (the lesson's repr), NDJSON or CSV.
+
+    Rows are formatted and written in batches, as the lessons are iterated,
+    so the stream should be buffered (e.g. a regular file).
+    """
+
+    FORMATS = ("text", "ndjson", "csv")
+    CSV_FIELDS = [
+        "id",
+        "weekday",
+        "number",
+        "time_start",
+        "time_end",
+        "register",
+        "team",
+        "subject",
+        "teachers",
+        "classroom",
+    ]
+
+    def __init__(self, stream: TextIO, format: str = "ndjson", batch: int = 1000):
+        if format not in self.FORMATS:
+            raise ValueError(f"Unknown format: {format}")
+        self.stream = stream
+        self.format = format
+        self.batch = batch
+        self.count = 0
+        self._json = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+        if format == "csv":
+            self._csv = csv.writer(stream, lineterminator="\n")
+            self._csv.writerow(self.CSV_FIELDS)
+
+    def _csv_row(self, lesson: Lesson) -> list:
+        row = lesson_dict(lesson)
+        row["teachers"] = ", ".join(row["teachers"])
+        return [row[field] for field in self.CSV_FIELDS]
+
+    def write(self, lessons: Iterable[Lesson]) -> int:
+        lessons = iter(lessons)
+        while chunk := list(islice(lessons, self.batch)):
+            if self.format == "csv":
+                self._csv.writerows(self._csv_row(lesson) for lesson in chunk)
+            elif self.format == "ndjson":
+                rows = (self._json(lesson_dict(lesson)) for lesson in chunk)
+                self.stream.write("".join(f"{row}\n" for row in rows))
+            else:
+                self.stream.write("".join(f"{lesson}\n" for lesson in chunk))
+            self.count += len(chunk)
+        return self.count
@@ -0,0 +1,202 @@
+import hashlib
+import json
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .export import lesson_dict
+from .index import LessonIndex
+from .memo import digest
+
+# LessonIndex attributes, feeds are rendered for every entity of these
+KINDS = ("registers", "teams", "teachers", "classrooms")
+CONTENT_TYPES = {
+    "ics": "text/calendar",
+    "json": "application/json",
+}
+
+
+class Feed(NamedTuple):
+    body: bytes
+    etag: str
+    content_type: str
+
+
+def _escape(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold(line: str) -> str:
+    # lines are limited to 75 octets, continued after CRLF and a space
+    data = line.encode()
+    if len(data) <= 75:
+        return line
+    parts = []
+    while data:
+        size = 75 if not parts else 74
+        # do not split multi-byte characters
+        while size < len(data) and data[size] & 0xC0 == 0x80:
+            size -= 1
+        parts.append(data[:size].decode())
+        data = data[size:]
+    return "\r\n ".join(parts)
+
+
+def _datetime(day: date, value: str) -> str:
+    hour, minute = value.split(":")
+    return f"{day:%Y%m%d}T{int(hour):02d}{int(minute):02d}00"
+
+
+def render_ics(
+    lessons: Iterable[Dict[str, Any]], name: str, edupage: str, start: date
+) -> bytes:
+    """
+    Render lesson dicts (see export.lesson_dict()) as an iCalendar feed of
+    weekly recurring events, starting in the week of `start`. Times are local
+    (floating), lessons without times are left out.
+    """
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//szkolny-eu//timetables-parser-edupage//EN",
+        f"X-WR-CALNAME:{_escape(name)}",
+    ]
+    monday = start - timedelta(days=start.weekday())
+    # constant, so that the feed only changes with its lessons
+    stamp = f"{monday:%Y%m%d}T000000Z"
+    for lesson in lessons:
+        if not lesson["time_start"] or not lesson["time_end"]:
+            continue
+        day = monday + timedelta(days=lesson["weekday"])
+        uid = f"{lesson['id']}-{lesson['weekday']}-{lesson['number']}@{edupage}"
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:{uid}",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART:{_datetime(day, lesson['time_start'])}",
+            f"DTEND:{_datetime(day, lesson['time_end'])}",
+            "RRULE:FREQ=WEEKLY",
+            f"SUMMARY:{_escape(lesson['subject'] or lesson['team'] or '')}",
+        ]
+        if lesson["classroom"]:
+            lines.append(f"LOCATION:{_escape(lesson['classroom'])}")
+        description = [lesson["team"] or lesson["register"], *lesson["teachers"]]
+        description = ", ".join(value for value in description if value)
+        if description:
+            lines.append(f"DESCRIPTION:{_escape(description)}")
+        lines.append("END:VEVENT")
+    lines.append("END:VCALENDAR")
+    return "".join(f"{_fold(line)}\r\n" for line in lines).encode()
+
+
+def render_json(lessons: Iterable[Dict[str, Any]]) -> bytes:
+    return json.dumps(list(lessons), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FeedCache:
+    """
+    iCalendar and JSON feeds of every register, team, teacher and classroom
+    of a school, rendered on first access and kept until their lessons change.
+
+    After every parse, update() compares a digest of each entity's lessons
+    with the previous one, dropping only the feeds of changed entities.
+    ETags are derived from the rendered content.
+    """
+
+    FORMATS = tuple(CONTENT_TYPES)
+
+    def __init__(self, edupage: str, start: Optional[date] = None):
+        self.edupage = edupage
+        # the first week of the calendar feeds
+        self.start = start or date.today()
+        # (kind, name) -> lesson dicts, digest
+        self.entities: Dict[Tuple[str, str], Tuple[List[dict], str]] = {}
+        self.feeds: Dict[Tuple[str, str, str], Feed] = {}
+        # bytes of all rendered feeds
+        self.size = 0
+        self.renders = 0
+        self.hits = 0
+
+    def _drop(self, key: Tuple[str, str]) -> None:
+        for format in self.FORMATS:
+            feed = self.feeds.pop((*key, format), None)
+            if feed is not None:
+                self.size -= len(feed.body)
+
+    def update(
+        self, index: LessonIndex, lessons: Optional[List[Dict[str, Any]]] = None
+    ) -> int:
+        """
+        Use lessons of a (newly) parsed school. Returns the number
+        of entities whose lessons changed.
+
+        `lessons` may be the lesson dicts of index.lessons (in the same order)
+        made by the caller, so that they are not kept twice.
+        """
+        if lessons is None:
+            lessons = [lesson_dict(lesson) for lesson in index.lessons]
+        dicts = {id(lesson): d for lesson, d in zip(index.lessons, lessons)}
+        entities = {}
+        changed = 0
+        for kind in KINDS:
+            lessons = getattr(index, kind)
+            for name, internal_id in index.names[kind].items():
+                rows = [dicts[id(lesson)] for lesson in lessons[internal_id]]
+                entities[(kind, name)] = (rows, digest(rows))
+        for key, (_, rows_digest) in entities.items():
+            old = self.entities.get(key)
+            if old is not None and old[1] == rows_digest:
+                continue
+            changed += 1
+            self._drop(key)
+        # entities that do not exist anymore
+        for key in self.entities.keys() - entities.keys():
+            self._drop(key)
+        self.entities = entities
+        return changed
+
+    def names(self, kind: str) -> List[str]:
+        return sorted(
+            name for entity_kind, name in self.entities if entity_kind == kind
+        )
+
+    def _render(self, kind: str, name: str, format: str) -> bytes:
+        lessons = self.entities[(kind, name)][0]
+        if format == "ics":
+            return render_ics(lessons, name, self.edupage, self.start)
+        return render_json(lessons)
+
+    def get(self, kind: str, name: str, format: str) -> Optional[Feed]:
+        """
+        The feed of an entity (kind being a LessonIndex attribute, e.g.
+        "teachers"), or None if the entity does not exist.
+        """
+        if format not in CONTENT_TYPES:
+            raise ValueError(f"Unknown format: {format}")
+        key = (kind, name, format)
+        feed = self.feeds.get(key)
+        if feed is not None:
+            self.hits += 1
+            return feed
+        if (kind, name) not in self.entities:
+            return None
+        body = self._render(kind, name, format)
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        feed = Feed(body, etag, CONTENT_TYPES[format])
+        self.feeds[key] = feed
+        self.size += len(body)
+        self.renders += 1
+        return feed
+
+    def stats(self) -> Dict[str, int]:
+        return dict(
+            entities=len(self.entities),
+            feeds=len(self.feeds),
+            bytes=self.size,
+            renders=self.renders,
+            hits=self.hits,
+        )
@@ -0,0 +1,95 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from timetables.schemas import Lesson, WeekDay
+
+Key = Union[int, str]
+
+
+def _sort_key(lesson: Lesson) -> Tuple[int, int]:
+    return lesson.weekday.value, lesson.number
+
+
+def _weekday(lesson: Lesson) -> int:
+    return lesson.weekday.value
+
+
+class LessonIndex:
+    """
+    Secondary indexes over lessons, built while the lessons are created.
+
+    Lessons are indexed by the internal ID of their register, team, teachers,
+    subject and classroom; every list is sorted by (weekday, number) once
+    finish() is called. Entities can be queried by internal ID or by name.
+    """
+
+    KINDS = ("registers", "teams", "teachers", "subjects", "classrooms")
+
+    def __init__(self):
+        self.lessons: List[Lesson] = []
+        self.registers: Dict[int, List[Lesson]] = defaultdict(list)
+        self.teams: Dict[int, List[Lesson]] = defaultdict(list)
+        self.teachers: Dict[int, List[Lesson]] = defaultdict(list)
+        self.subjects: Dict[int, List[Lesson]] = defaultdict(list)
+        self.classrooms: Dict[int, List[Lesson]] = defaultdict(list)
+        # (weekday, number) -> lessons
+        self.grid: Dict[Tuple[int, int], List[Lesson]] = defaultdict(list)
+        # kind -> name -> internal ID
+        self.names: Dict[str, Dict[str, int]] = {kind: {} for kind in self.KINDS}
+
+    def _add(self, kind: str, entity: Any, lesson: Lesson) -> None:
+        if entity is None:
+            return
+        getattr(self, kind)[entity.internal_id].append(lesson)
+        self.names[kind][entity.name] = entity.internal_id
+
+    def add(self, lesson: Lesson) -> None:
+        self.lessons.append(lesson)
+        self._add("registers", lesson.register_, lesson)
+        self._add("teams", lesson.team, lesson)
+        for teacher in lesson.teachers:
+            self._add("teachers", teacher, lesson)
+        self._add("subjects", lesson.subject, lesson)
+        self._add("classrooms", lesson.classroom, lesson)
+        self.grid[_sort_key(lesson)].append(lesson)
+
+    def finish(self) -> None:
+        self.lessons.sort(key=_sort_key)
+        for kind in self.KINDS:
+            for lessons in getattr(self, kind).values():
+                lessons.sort(key=_sort_key)
+
+    def clear(self) -> None:
+        self.__init__()
+
+    def _query(
+        self, kind: str, key: Key, weekday: Optional[Union[WeekDay, int]]
+    ) -> List[Lesson]:
+        if isinstance(key, str):
+            key = self.names[kind].get(key)
+        lessons = getattr(self, kind).get(key, [])
+        if weekday is None:
+            return lessons
+        weekday = getattr(weekday, "value", weekday)
+        start = bisect_left(lessons, weekday, key=_weekday)
+        end = bisect_right(lessons, weekday, lo=start, key=_weekday)
+        return lessons[start:end]
+
+    def register(self, key: Key, weekday: WeekDay = None) -> List[Lesson]:
+        return self._query("registers", key, weekday)
+
+    def team(self, key: Key, weekday: WeekDay = None) -> List[Lesson]:
+        return self._query("teams", key, weekday)
+
+    def teacher(self, key: Key, weekday: WeekDay = None) -> List[Lesson]:
+        return self._query("teachers", key, weekday)
+
+    def subject(self, key: Key, weekday: WeekDay = None) -> List[Lesson]:
+        return self._query("subjects", key, weekday)
+
+    def classroom(self, key: Key, weekday: WeekDay = None) -> List[Lesson]:
+        return self._query("classrooms", key, weekday)
+
+    def at(self, weekday: Union[WeekDay, int], number: int) -> List[Lesson]:
+        return self.grid.get((getattr(weekday, "value", weekday), number), [])
@@ -0,0 +1,12 @@
+from .base import Job, JobQueue, JobTiming
+from .sqlite import SqliteJobQueue
+from .worker import LeaseLostError, Worker
+
+__all__ = [
+    "Job",
+    "JobQueue",
+    "JobTiming",
+    "LeaseLostError",
+    "SqliteJobQueue",
+    "Worker",
+]
@@ -0,0 +1,113 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List, Optional
+
+from pydantic import BaseModel
+
+from ..api.model import Session
+
+
+class Job(BaseModel):
+    """
+    A request to parse a single school, with EdupageParser.enqueue_all()
+    options. Leased by one worker at a time.
+    """
+
+    id: int
+    session: Session
+    options: Dict[str, Any] = {}
+    attempts: int = 0
+    worker: Optional[str] = None
+    lease_until: Optional[float] = None
+
+    @property
+    def edupage(self) -> str:
+        return self.session.edupage_name()
+
+
+class JobTiming(BaseModel):
+    job_id: int
+    edupage: str
+    worker: str
+    started: float
+    duration: float
+    error: Optional[str] = None
+
+
+class JobQueue(ABC):
+    """
+    A durable queue of parse jobs, shared by a coordinator and many workers
+    (possibly on other machines).
+
+    A leased job is owned by its worker until the lease expires; workers
+    renew the lease while parsing. Jobs of expired leases are leased again.
+    Failed jobs are retried after an exponentially growing delay; a job
+    fails for good after `max_attempts` attempts, including expired leases.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 5,
+        retry_interval: float = 60.0,
+        max_retry_interval: float = 3600.0,
+    ):
+        self.max_attempts = max_attempts
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+
+    def retry_delay(self, attempts: int) -> float:
+        delay = self.retry_interval * 2 ** max(attempts - 1, 0)
+        return min(delay, self.max_retry_interval)
+
+    @abstractmethod
+    async def put_many(
+        self, sessions: Iterable[Session], options: Optional[dict] = None
+    ) -> List[int]:
+        """
+        Add a job for every session. A school already waiting in the queue
+        is not added again, its job is updated instead. Returns the job IDs.
+        """
+
+    async def put(self, session: Session, options: Optional[dict] = None) -> int:
+        return (await self.put_many([session], options))[0]
+
+    @abstractmethod
+    async def lease(self, worker: str, lease_time: float) -> Optional[Job]:
+        """Take the next due job, for lease_time seconds."""
+
+    @abstractmethod
+    async def renew(self, job: Job, lease_time: float) -> bool:
+        """Extend the lease. Returns False if the job is no longer leased by its worker."""
+
+    @abstractmethod
+    async def complete(self, job: Job, started: float, duration: float) -> None:
+        """Mark the job as done, and record its timing."""
+
+    @abstractmethod
+    async def fail(
+        self,
+        job: Job,
+        started: float,
+        duration: float,
+        error: str,
+        retry: bool = True,
+    ) -> None:
+        """Record the failure, and schedule a retry (unless retry is False or out of attempts)."""
+
+    @abstractmethod
+    async def stats(self) -> Dict[str, int]:
+        """Number of jobs in every state."""
+
+    @abstractmethod
+    async def timings(
+        self, edupage: Optional[str] = None, limit: int = 100
+    ) -> List[JobTiming]:
+        """The most recent timings, optionally of a single school."""
+
+    async def close(self) -> None:
+        pass
+
+    async def __aenter__(self) -> "JobQueue":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
@@ -0,0 +1,213 @@
+import asyncio
+import json
+import sqlite3
+import time
+from contextlib import closing
+from typing import Dict, Iterable, List, Optional
+
+from ..api.model import Session
+from .base import Job, JobQueue, JobTiming
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+class SqliteJobQueue(JobQueue):
+    """
+    Stores jobs in a single SQLite database, in WAL mode. Jobs are leased
+    in IMMEDIATE transactions, so that many processes (e.g. on a shared
+    volume of one machine) never lease the same job.
+    """
+
+    def __init__(self, path: str = "edupage_jobs.db", timeout: float = 30.0, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.timeout = timeout
+        with closing(self._connect()) as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id INTEGER PRIMARY KEY, edupage TEXT NOT NULL, "
+                "session TEXT NOT NULL, options TEXT NOT NULL, "
+                "state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+                "not_before REAL NOT NULL, worker TEXT, lease_until REAL, "
+                "error TEXT)"
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_due ON jobs (state, not_before)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS timings ("
+                "job_id INTEGER NOT NULL, edupage TEXT NOT NULL, "
+                "worker TEXT NOT NULL, started REAL NOT NULL, "
+                "duration REAL NOT NULL, error TEXT)"
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS timings_edupage "
+                "ON timings (edupage, started)"
+            )
+            db.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        # transactions are managed explicitly
+        return sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+
+    def _put_many(self, sessions: List[Session], options: dict) -> List[int]:
+        ids = []
+        now = time.time()
+        with closing(self._connect()) as db:
+            db.execute("BEGIN IMMEDIATE")
+            for session in sessions:
+                edupage = session.edupage_name()
+                row = db.execute(
+                    "SELECT id FROM jobs WHERE edupage = ? AND state = ?",
+                    (edupage, PENDING),
+                ).fetchone()
+                if row:
+                    db.execute(
+                        "UPDATE jobs SET session = ?, options = ? WHERE id = ?",
+                        (session.json(), json.dumps(options), row[0]),
+                    )
+                    ids.append(row[0])
+                    continue
+                cursor = db.execute(
+                    "INSERT INTO jobs (edupage, session, options, state, not_before) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (edupage, session.json(), json.dumps(options), PENDING, now),
+                )
+                ids.append(cursor.lastrowid)
+            db.execute("COMMIT")
+        return ids
+
+    def _lease(self, worker: str, lease_time: float) -> Optional[Job]:
+        now = time.time()
+        with closing(self._connect()) as db:
+            db.execute("BEGIN IMMEDIATE")
+            # jobs whose workers keep dying (e.g. killed when out of memory)
+            # are not leased again after max_attempts
+            db.execute(
+                "UPDATE jobs SET state = ?, error = ?, worker = NULL, lease_until = NULL "
+                "WHERE state = ? AND lease_until < ? AND attempts >= ?",
+                (FAILED, "Lease expired", LEASED, now, self.max_attempts),
+            )
+            row = db.execute(
+                "SELECT id, session, options, attempts FROM jobs "
+                "WHERE (state = ? AND not_before <= ?) "
+                "OR (state = ? AND lease_until < ?) "
+                "ORDER BY not_before LIMIT 1",
+                (PENDING, now, LEASED, now),
+            ).fetchone()
+            if not row:
+                db.execute("COMMIT")
+                return None
+            job_id, session, options, attempts = row
+            lease_until = now + lease_time
+            db.execute(
+                "UPDATE jobs SET state = ?, worker = ?, lease_until = ?, "
+                "attempts = attempts + 1 WHERE id = ?",
+                (LEASED, worker, lease_until, job_id),
+            )
+            db.execute("COMMIT")
+        return Job(
+            id=job_id,
+            session=Session.parse_raw(session),
+            options=json.loads(options),
+            attempts=attempts + 1,
+            worker=worker,
+            lease_until=lease_until,
+        )
+
+    def _renew(self, job: Job, lease_time: float) -> bool:
+        lease_until = time.time() + lease_time
+        with closing(self._connect()) as db:
+            cursor = db.execute(
+                "UPDATE jobs SET lease_until = ? "
+                "WHERE id = ? AND state = ? AND worker = ?",
+                (lease_until, job.id, LEASED, job.worker),
+            )
+        if cursor.rowcount:
+            job.lease_until = lease_until
+        return cursor.rowcount > 0
+
+    def _finish(
+        self,
+        job: Job,
+        started: float,
+        duration: float,
+        error: Optional[str],
+        retry: bool,
+    ) -> None:
+        with closing(self._connect()) as db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute(
+                "INSERT INTO timings (job_id, edupage, worker, started, duration, error) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job.id, job.edupage, job.worker, started, duration, error),
+            )
+            if error is None:
+                state, not_before = DONE, started
+            elif retry and job.attempts < self.max_attempts:
+                delay = self.retry_delay(job.attempts)
+                state, not_before = PENDING, time.time() + delay
+            else:
+                state, not_before = FAILED, started
+            # the lease may have expired and been taken over by another worker
+            db.execute(
+                "UPDATE jobs SET state = ?, not_before = ?, error = ?, "
+                "worker = NULL, lease_until = NULL "
+                "WHERE id = ? AND state = ? AND worker = ?",
+                (state, not_before, error, job.id, LEASED, job.worker),
+            )
+            db.execute("COMMIT")
+
+    def _stats(self) -> Dict[str, int]:
+        with closing(self._connect()) as db:
+            rows = db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state")
+            return dict(rows.fetchall())
+
+    def _timings(self, edupage: Optional[str], limit: int) -> List[JobTiming]:
+        query = "SELECT job_id, edupage, worker, started, duration, error FROM timings"
+        args = []
+        if edupage:
+            query += " WHERE edupage = ?"
+            args.append(edupage)
+        query += " ORDER BY started DESC LIMIT ?"
+        args.append(limit)
+        with closing(self._connect()) as db:
+            rows = db.execute(query, args).fetchall()
+        fields = list(JobTiming.__fields__)
+        return [JobTiming(**dict(zip(fields, row))) for row in rows]
+
+    async def put_many(
+        self, sessions: Iterable[Session], options: Optional[dict] = None
+    ) -> List[int]:
+        return await asyncio.to_thread(self._put_many, list(sessions), options or {})
+
+    async def lease(self, worker: str, lease_time: float) -> Optional[Job]:
+        return await asyncio.to_thread(self._lease, worker, lease_time)
+
+    async def renew(self, job: Job, lease_time: float) -> bool:
+        return await asyncio.to_thread(self._renew, job, lease_time)
+
+    async def complete(self, job: Job, started: float, duration: float) -> None:
+        await asyncio.to_thread(self._finish, job, started, duration, None, False)
+
+    async def fail(
+        self,
+        job: Job,
+        started: float,
+        duration: float,
+        error: str,
+        retry: bool = True,
+    ) -> None:
+        await asyncio.to_thread(self._finish, job, started, duration, error, retry)
+
+    async def stats(self) -> Dict[str, int]:
+        return await asyncio.to_thread(self._stats)
+
+    async def timings(
+        self, edupage: Optional[str] = None, limit: int = 100
+    ) -> List[JobTiming]:
+        return await asyncio.to_thread(self._timings, edupage, limit)
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+from typing import Awaitable, Callable, Optional, Set
+
+from ..api import SessionExpiredError
+from ..api.transport import Transport
+from ..cache import CacheBackend
+from ..deadline import Deadline, RunResult
+from ..memo import ParseMemo
+from ..parser import EdupageParser
+from .base import Job, JobQueue
+
+log = logging.getLogger(__name__)
+
+
+class LeaseLostError(Exception):
+    def __init__(self, job: Job) -> None:
+        self.job = job
+        super().__init__(f"Lease lost: job {job.id} ({job.edupage})")
+
+
+class Worker:
+    """
+    Leases jobs from a JobQueue and parses them, up to `concurrency`
+    at a time. Leases are renewed every `lease_time / 3` seconds while
+    parsing; a parse whose lease is lost (e.g. after a long network
+    outage) is cancelled, as another worker may have taken the job over.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        name: Optional[str] = None,
+        on_result: Optional[Callable[[Job, RunResult], Awaitable[None]]] = None,
+        concurrency: int = 4,
+        lease_time: float = 300.0,
+        poll_interval: float = 5.0,
+        cache_backend: Optional[CacheBackend] = None,
+        transport: Optional[Transport] = None,
+        memo: Optional[ParseMemo] = None,
+        budget: Optional[float] = None,
+    ):
+        self.queue = queue
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.on_result = on_result
+        self.lease_time = lease_time
+        self.poll_interval = poll_interval
+        self.cache_backend = cache_backend
+        self.transport = transport
+        self.memo = memo
+        # time budget of every school, see EdupageParser(deadline=)
+        self.budget = budget
+        self.processed = 0
+        self.partial = 0
+        self.failed = 0
+        self._slots = asyncio.Semaphore(concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def _keep_leased(self, job: Job, task: asyncio.Task) -> None:
+        while True:
+            await asyncio.sleep(self.lease_time / 3)
+            if not await self.queue.renew(job, self.lease_time):
+                log.warning(f"Lost the lease of job {job.id} ({job.edupage})")
+                task.cancel()
+                return
+
+    async def _parse(self, job: Job) -> RunResult:
+        async with EdupageParser(
+            job.session,
+            cache_backend=self.cache_backend,
+            transport=self.transport,
+            memo=self.memo,
+            deadline=Deadline(self.budget) if self.budget else None,
+        ) as parser:
+            parser.enqueue_all(**job.options)
+            ds = await parser.run_all()
+            result = RunResult(ds, tuple(parser.skipped))
+            if result.partial:
+                self.partial += 1
+                log.warning(f"Job {job.id} ({job.edupage}) skipped {parser.skipped}")
+        if self.on_result:
+            await self.on_result(job, result)
+        return result
+
+    async def process(self, job: Job) -> RunResult:
+        """
+        Parse a leased job, then mark it as done or failed in the queue.
+        """
+        started = time.time()
+        task = asyncio.create_task(self._parse(job))
+        keeper = asyncio.create_task(self._keep_leased(job, task))
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            if not keeper.done():
+                # the worker itself is being cancelled, the lease will expire
+                raise
+            self.failed += 1
+            raise LeaseLostError(job)
+        except Exception as e:
+            self.failed += 1
+            log.warning(f"Job {job.id} ({job.edupage}) failed: {e!r}")
+            # an expired session would fail again
+            retry = not isinstance(e, SessionExpiredError)
+            await self.queue.fail(
+                job, started, time.time() - started, repr(e), retry=retry
+            )
+            raise
+        finally:
+            keeper.cancel()
+        self.processed += 1
+        await self.queue.complete(job, started, time.time() - started)
+        return result
+
+    async def _process_task(self, job: Job) -> None:
+        try:
+            await self.process(job)
+        except Exception:
+            pass
+        finally:
+            self._slots.release()
+
+    async def run(self, until_empty: bool = False) -> None:
+        """
+        Process jobs until cancelled, or (if `until_empty`) until no job is due.
+        """
+        try:
+            while True:
+                await self._slots.acquire()
+                job = await self.queue.lease(self.name, self.lease_time)
+                if job is None:
+                    self._slots.release()
+                    if until_empty:
+                        break
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                task = asyncio.create_task(self._process_task(job))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            await asyncio.gather(*self._tasks)
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
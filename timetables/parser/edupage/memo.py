@@ -0,0 +1,61 @@
+import json
+from collections import OrderedDict
+from hashlib import sha1
+from typing import Any, Dict, Hashable, NamedTuple, Optional, Tuple
+
+from .index import LessonIndex
+from .occupancy import Occupancy
+from .vector import CardColumns
+
+
+def digest(rows: Any) -> str:
+    """
+    Digest of a table's rows, as decoded from the fetched payload.
+    """
+    data = json.dumps(rows, separators=(",", ":"), ensure_ascii=False, default=str)
+    return sha1(data.encode()).hexdigest()
+
+
+class ParseResult(NamedTuple):
+    ds: Any
+    index: LessonIndex
+    occupancy: Dict[str, Occupancy]
+    columns: Optional[CardColumns]
+
+
+class ParseMemo:
+    """
+    Remembers the last parse result of every school, along with the digests
+    of all tables it was parsed from. Parsers sharing a memo skip parsing
+    when all their input tables are unchanged, and return the stored result.
+
+    Stored results are shared by all such parsers, and must not be modified.
+    At most `max_schools` results are kept, evicting the least recently used.
+    """
+
+    def __init__(self, max_schools: int = 1000):
+        self.max_schools = max_schools
+        self.entries: OrderedDict[str, Tuple[Hashable, ParseResult]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, edupage: str, key: Hashable) -> Optional[ParseResult]:
+        entry = self.entries.get(edupage)
+        if entry is None or entry[0] != key:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(edupage)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, edupage: str, key: Hashable, result: ParseResult) -> None:
+        self.entries[edupage] = (key, result)
+        self.entries.move_to_end(edupage)
+        while len(self.entries) > self.max_schools:
+            self.entries.popitem(last=False)
+
+    def discard(self, edupage: str) -> None:
+        self.entries.pop(edupage, None)
@@ -0,0 +1,109 @@
+from typing import Dict, Iterable, List, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _bits(mask: int) -> Iterable[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class Occupancy:
+    """
+    Occupancy of entities (e.g. classrooms or teachers) in time slots,
+    stored as bitsets in both directions:
+    - per entity, a bitset of occupied slots,
+    - per slot, a bitset of occupied entities.
+
+    A slot is a (weekday, lesson number) pair. Entities are identified
+    by their internal ID, and indexed in the order of adding them.
+    """
+
+    def __init__(self, periods: int = 32, days: int = 7):
+        self.periods = periods
+        self.days = days
+        self.ids: List[int] = []
+        self.index: Dict[int, int] = {}
+        self.entities: List[int] = []
+        self.slots: List[int] = [0] * (days * periods)
+        # (internal ID, weekday, number) booked more than once
+        self.conflicts: Set[Tuple[int, int, int]] = set()
+
+    def _slot(self, weekday: int, number: int) -> int:
+        if not 0 <= number < self.periods or not 0 <= weekday < self.days:
+            raise ValueError(f"Slot out of range: {weekday}, {number}")
+        return weekday * self.periods + number
+
+    @property
+    def _all(self) -> int:
+        return (1 << len(self.ids)) - 1
+
+    def _ids(self, mask: int) -> List[int]:
+        return [self.ids[i] for i in _bits(mask)]
+
+    def add(self, internal_id: int) -> int:
+        if internal_id not in self.index:
+            self.index[internal_id] = len(self.ids)
+            self.ids.append(internal_id)
+            self.entities.append(0)
+        return self.index[internal_id]
+
+    def occupy(self, internal_id: int, weekday: int, number: int) -> None:
+        entity = self.add(internal_id)
+        slot = self._slot(weekday, number)
+        if self.entities[entity] >> slot & 1:
+            self.conflicts.add((internal_id, weekday, number))
+        self.entities[entity] |= 1 << slot
+        self.slots[slot] |= 1 << entity
+
+    def is_free(self, internal_id: int, weekday: int, number: int) -> bool:
+        entity = self.index.get(internal_id)
+        if entity is None:
+            return True
+        return not self.entities[entity] >> self._slot(weekday, number) & 1
+
+    def busy(self, weekday: int, numbers: Iterable[int]) -> List[int]:
+        """
+        IDs of entities occupied in any of the lesson numbers on the weekday.
+        """
+        mask = 0
+        for number in numbers:
+            mask |= self.slots[self._slot(weekday, number)]
+        return self._ids(mask)
+
+    def free(self, weekday: int, numbers: Iterable[int]) -> List[int]:
+        """
+        IDs of entities free in all the lesson numbers on the weekday.
+        """
+        mask = self._all
+        for number in numbers:
+            mask &= ~self.slots[self._slot(weekday, number)]
+        return self._ids(mask)
+
+    def common_free(self, internal_ids: Iterable[int]) -> List[Tuple[int, int]]:
+        """
+        Slots (weekday, number) in which all the entities are free.
+        """
+        mask = (1 << len(self.slots)) - 1
+        for internal_id in internal_ids:
+            entity = self.index.get(internal_id)
+            if entity is not None:
+                mask &= ~self.entities[entity]
+        return [divmod(slot, self.periods) for slot in _bits(mask)]
+
+    def to_numpy(self) -> "np.ndarray":
+        """
+        A boolean array of shape (entities, days, periods).
+        """
+        if np is None:
+            raise RuntimeError("Occupancy.to_numpy() requires numpy")
+        size = (len(self.slots) + 7) // 8
+        data = b"".join(mask.to_bytes(size, "little") for mask in self.entities)
+        bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), bitorder="little")
+        bits = bits.reshape(len(self.entities), size * 8)[:, : len(self.slots)]
+        return bits.reshape(len(self.entities), self.days, self.periods).astype(bool)
@@ -1,47 +1,132 @@
+import asyncio
 import json
 from base64 import b64decode
-from datetime import datetime
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta
 from io import BytesIO
 from math import log
-from os.path import isfile
-from typing import Dict, List, Union
+from os import remove, replace
+from os.path import abspath, dirname, getmtime, isfile
+from shutil import copyfileobj
+from tempfile import mkstemp
+from time import time
+from typing import ContextManager, Dict, List, Optional, Union
 from urllib.parse import urlparse
 from zipfile import ZipFile
 
 from timetables.parser.base import File, Parser
 from timetables.schemas import Lesson, Register, Team, WeekDay
 
+from . import vector
 from .api import EdupageApi
-from .api.model import Session
-
-ID_STRIP = "* "
+from .api.const import TABLES_V2_TIMETABLE
+from .api.model import Session, TimetableVersion
+from .api.transport import Transport
+from .cache import CacheBackend, FileCache
+from .deadline import Deadline, DeadlineExceeded, StageSkipped
+from .index import LessonIndex
+from .memo import ParseMemo, ParseResult, digest
+from .occupancy import Occupancy
+from .profiler import Profiler
+from .rows import (
+    CardRow,
+    ClassroomRow,
+    ClassRow,
+    GroupRow,
+    LessonRow,
+    PeriodRow,
+    SubjectRow,
+    TeacherRow,
+    dump,
+    project,
+)
+from .vector import CardColumns
 
 
 class EdupageParser(Parser):
     api_session: Session
     edupage: str
-    cache: Dict[str, list] = {}
-    cache_file: str = "cache.json"
-    periods: Dict[int, dict] = {}
-    lessons: Dict[int, dict] = {}
+    cache: Dict[str, list]
+    cache_backend: Optional[CacheBackend]
+    periods: Dict[int, PeriodRow]
+    lessons: Dict[int, dict]
+    columns: Optional[CardColumns]
+    versions: List[TimetableVersion]
+    digests: Dict[str, str]
+    memo_hit: Optional[ParseResult]
+    teacher_names: Dict[int, str]
+    keep_versions: bool = False
 
-    def __init__(self, session: Session, enable_cache: bool = False):
-        self.api = EdupageApi()
+    def __init__(
+        self,
+        session: Session,
+        enable_cache: bool = False,
+        vectorize: bool = False,
+        build_lessons: bool = True,
+        profile_file: Optional[str] = None,
+        cache_backend: Optional[CacheBackend] = None,
+        cache_ttl: Optional[int] = None,
+        refresh: bool = False,
+        transport: Optional[Transport] = None,
+        memo: Optional[ParseMemo] = None,
+        compact: bool = False,
+        deadline: Optional[Deadline] = None,
+        optional_reserve: float = 0.5,
+        teacher_names_ttl: Optional[int] = 7 * 24 * 3600,
+    ):
+        # a shared transport lets many parsers reuse the same connections
+        self.api = EdupageApi(transport=transport)
         self.api_session = session
         self.edupage = str(session.edupage)
-        self.cache_file = f"cache_{self.edupage}.json" if enable_cache else None
+        # enable_cache without a backend stores fetched tables in a local directory
+        if cache_backend is None and enable_cache:
+            cache_backend = FileCache()
+        self.cache_backend = cache_backend
+        self.cache_ttl = cache_ttl
+        # full teacher names (from v1) rarely change, so they are cached for longer
+        self.teacher_names_ttl = teacher_names_ttl
+        # refresh fetches all data again, but still stores it in the cache
+        self.refresh = refresh
+        # vectorized card parsing needs numpy, fall back silently if unavailable
+        self.vectorize = vectorize and vector.is_available()
+        # columnar consumers may use self.columns only, skipping Lesson objects
+        self.build_lessons = build_lessons or not self.vectorize
+        self.profile_file = profile_file
+        self.profiler = Profiler() if profile_file else None
+        # compact keeps fetched tables as typed rows with only the used fields
+        self.compact = compact
+        # skips parsing if all fetched tables are the same as last time
+        self.memo = memo
+        # optional stages (v1 teacher names) are skipped or cancelled when less than
+        # optional_reserve of the budget remains, the rest is left for required stages
+        self.deadline = deadline
+        self.optional_reserve = optional_reserve
+        self.skipped: List[str] = []
+        self._reset_state()
         super().__init__()
 
     def enqueue_all(
-        self, try_v1_teachers: bool = False, try_v1_full_teachers: bool = False
+        self,
+        try_v1_teachers: bool = False,
+        try_v1_full_teachers: bool = False,
+        all_versions: bool = False,
     ):
-        if try_v1_full_teachers:
+        # all timetable versions are only available in the v1 "timetables" payload
+        self.keep_versions = all_versions
+        try_v1_full_teachers = try_v1_full_teachers or all_versions
+        # with a cache backend, only the full names are kept (with a longer TTL),
+        # so that the v1 "timetables" payload is fetched only when they may change
+        cached_names = (
+            try_v1_full_teachers and not all_versions and self.cache_backend is not None
+        )
+        if try_v1_full_teachers and not cached_names:
             self._enqueue_path("/get/v1/timetables/teachers")
-        elif try_v1_teachers:
+        elif try_v1_teachers and not try_v1_full_teachers:
             self._enqueue_path("/get/v1/ucitel")
-        self._enqueue_path(
-            "/get/v2/Timetable/periods,classes,groups,subjects,teachers,classrooms,lessons,cards"
-        )
+        self._enqueue_path(f"/get/v2/Timetable/{','.join(TABLES_V2_TIMETABLE)}")
+        if cached_names:
+            self._enqueue_path("/names/cache/teachers")
+            self._enqueue_path("/names/v1/teachers")
         # ensure the teachers parsing order, so that v1's full names replace the v2's short names
         # also, v1's teachers obtained from "timetables" seem to be compatible with v2's teachers
         self._enqueue_path("/parse/v2/teachers")
@@ -53,6 +138,59 @@ class EdupageParser(Parser):
         file.path = f"edupage://{self.edupage}{path}"
         super().enqueue(file)
 
+    def _stage(self, name: str) -> ContextManager[None]:
+        if not self.profiler:
+            return nullcontext()
+        return self.profiler.stage(name)
+
+    def _cache_key(self, table: str) -> str:
+        return f"{self.edupage}/{table}"
+
+    async def _load_cached(self, tables: List[str]) -> None:
+        if not self.cache_backend or self.refresh:
+            return
+        keys = {self._cache_key(t): t for t in tables if t not in self.cache}
+        if not keys:
+            return
+        with self._stage("cache"):
+            found = await self.cache_backend.get_many(keys)
+        for key, rows in found.items():
+            self.cache[keys[key]] = rows
+
+    async def _store_cached(self, tables: List[str]) -> None:
+        if not self.cache_backend:
+            return
+        items = {
+            self._cache_key(t): dump(self.cache[t])
+            for t in tables
+            if t in self.cache
+        }
+        if not items:
+            return
+        with self._stage("cache"):
+            await self.cache_backend.put_many(items, ttl=self.cache_ttl)
+
+    def _check_memo(self) -> bool:
+        # called before the first parse step, once all tables are fetched
+        if self.memo is None or not self.digests:
+            return False
+        if self.memo_key is None:
+            options = (self.vectorize, self.build_lessons)
+            self.memo_key = (options, tuple(sorted(self.digests.items())))
+            self.memo_hit = self.memo.get(self.edupage, self.memo_key)
+        return self.memo_hit is not None
+
+    async def run_all(self):
+        ds = await super().run_all()
+        if self.memo_hit is not None:
+            # the stored result is shared, see ParseMemo
+            ds, self.index, self.occupancy, self.columns = self.memo_hit
+            self.ds = ds
+        elif self.memo_key is not None:
+            result = ParseResult(ds, self.index, self.occupancy, self.columns)
+            self.memo.put(self.edupage, self.memo_key, result)
+        return ds
+
     def uncached_tables(self, tables: List[str]) -> List[str]:
         tables2 = list(tables)
         for table in tables:
@@ -61,7 +199,6 @@ class EdupageParser(Parser):
         return tables2
 
     async def _parse_file(self, file: File) -> None:
-        session = self.api_session
         url = urlparse(file.path)
 
         path: List[Union[str, List[str]]]
@@ -73,42 +210,108 @@ class EdupageParser(Parser):
             # enqueue parsing all tables
             for table in path[last]:
                 self._enqueue_path(f"/parse/{path[1]}/{table}")
-            path[last] = self.uncached_tables(path[last])
+            tables = path[last]
+            # the versions are only read from the v1 payload, never from cached tables
+            if path[1:3] != ["v1", "timetables"] or not self.keep_versions:
+                await self._load_cached(tables)
+            path[last] = self.uncached_tables(tables)
+        elif path[0] == "parse" and self._check_memo():
+            self.cache.pop(path[2], None)
+            return
         elif path[0] == "parse" and path[2] not in self.cache:
             return
 
+        try:
+            self._checkpoint(path, url.path)
+        except StageSkipped:
+            self.skipped.append(url.path)
+            return
+
+        with self._stage(url.path):
+            try:
+                await self._run_stage(path, url.path)
+            except StageSkipped:
+                self.skipped.append(url.path)
+                return
+            if path[0] == "get":
+                if self.compact:
+                    self._project_tables(tables)
+                await self._store_cached(path[-1])
+                if self.memo is not None:
+                    self._digest_tables(tables)
+            elif path[0] == "parse":
+                # the raw table is not needed anymore
+                self.cache.pop(path[2], None)
+
+    @property
+    def partial(self) -> bool:
+        """
+        Whether any optional stage was skipped, because of the deadline.
+        """
+        return bool(self.skipped)
+
+    def _is_optional(self, path: List[Union[str, List[str]]]) -> bool:
+        # v1 data only enriches teacher names, unless all versions are requested
+        return path[1] == "v1" and not self.keep_versions
+
+    def _checkpoint(self, path: List[Union[str, List[str]]], what: str) -> None:
+        if not self.deadline:
+            return
+        if not self._is_optional(path):
+            self.deadline.check(what)
+        elif self.deadline.remaining() < self.deadline.budget * self.optional_reserve:
+            raise StageSkipped(what)
+
+    async def _run_stage(self, path: List[Union[str, List[str]]], what: str) -> None:
+        if not self.deadline:
+            await self._parse_path(path)
+            return
+        timeout = self.deadline.remaining()
+        if self._is_optional(path):
+            timeout -= self.deadline.budget * self.optional_reserve
+        try:
+            await asyncio.wait_for(self._parse_path(path), max(timeout, 0.0))
+        except asyncio.TimeoutError:
+            if self._is_optional(path):
+                raise StageSkipped(what)
+            if self.deadline.expired:
+                raise DeadlineExceeded(f"Deadline of {self.deadline.budget}s exceeded {what}")
+            raise
+
+    def _digest_tables(self, tables: List[str]) -> None:
+        with self._stage("digest"):
+            for table in tables:
+                if table in self.cache:
+                    self.digests[table] = digest(dump(self.cache[table]))
+
+    def _project_tables(self, tables: List[str]) -> None:
+        with self._stage("project"):
+            for table in tables:
+                if table in self.cache:
+                    self.cache[table] = project(table, self.cache[table])
+
+    async def _parse_path(self, path: List[Union[str, List[str]]]) -> None:
+        session = self.api_session
         match path:
             case ["get", "v1", "timetables", list(tables)] if tables:
-                zip_cache = f"timetables.json"
-                if not isfile(zip_cache):
-                    data = await self.api.v1.sync(session, ["timetables"])
-                    b64: str = data["timetables"]["data"]
-                    zip_data = b64decode(b64.encode())
-                    with ZipFile(BytesIO(zip_data), "r") as zf:
-                        zf.extract("timetables.json")
-                    del data
-                    del b64
-                    del zip_data
-                with open(zip_cache, "rb") as f:
-                    timetables: dict = json.load(f)
-                    timetable: dict = next(v for v in timetables["timetables"].values())
-                    dbi: dict = timetable["dbi"]
-                    # cache all tables
-                    for table in tables:
-                        self.cache[table] = list(dbi[table].values())
-                    del timetables
-                    del timetable
-                    del dbi
+                version = await self._get_timetables_v1(path, tables, self.refresh)
+                # cache all tables
+                for table in tables:
+                    self.cache[table] = version.tables[table]
+                del version
 
             case ["get", "v1", list(tables)] if tables:
-                data = await self.api.v1.sync(session, tables)
+                with self._stage("fetch"):
+                    data = await self.api.v1.sync(session, tables)
                 # cache all tables
                 for table in tables:
                     self.cache[table] = list(data[table]["data"].values())
                 del data
 
             case ["get", "v2", ("Dbi" | "Timetable") as source, list(tables)] if tables:
-                data = await self.api.v2.sync(session, tables={source: [""]})
+                # the response JSON is decoded while fetching
+                with self._stage("fetch"):
+                    data = await self.api.v2.sync(session, tables={source: [""]})
                 # extract the table dicts from the structure
                 if path[2] == "Dbi":
                     data = data["Dbi"]["data"][""]
@@ -126,6 +329,12 @@ class EdupageParser(Parser):
                         self.cache[table] = data[table]
                 del data
 
+            case ["names", "cache", "teachers"]:
+                await self._load_teacher_names()
+            case ["names", "v1", "teachers"]:
+                if self._unknown_teachers():
+                    await self._fetch_teacher_names(path)
+
             case ["parse", "v1", "ucitel" as table]:
                 await self._parse_teachers_v1(self.cache[table])
             case ["parse", "v2", "periods" as table]:
@@ -144,152 +353,354 @@ class EdupageParser(Parser):
                 await self._parse_lessons_v2(self.cache[table])
             case ["parse", "v2", "cards" as table]:
                 await self._parse_cards_v2(self.cache[table])
+                # lessons and periods are only needed to build the cards
+                # (vector.CardColumns keep the lessons they refer to)
+                self.periods.clear()
+                self.lessons.clear()
 
-    async def _parse_teachers_v1(self, teachers: list) -> None:
-        for teacher in teachers:
-            teacher: dict
-            name = " ".join(
-                [
-                    teacher["p_priezvisko"].strip(),
-                    teacher["p_meno"].strip(),
-                ]
+    async def _get_timetables_v1(
+        self, path: List[Union[str, List[str]]], tables: List[str], refresh: bool
+    ) -> TimetableVersion:
+        zip_cache = f"timetables_{self.edupage}.json"
+        if refresh or not self._is_fresh(zip_cache):
+            with self._stage("fetch"):
+                data = await self.api.v1.sync(self.api_session, ["timetables"])
+            self._checkpoint(path, "decompress")
+            # decompressing and decoding the (huge) payload run in threads, so that
+            # they do not block other parsers, and the stage can still be cancelled
+            with self._stage("decompress"):
+                b64: str = data["timetables"]["data"]
+                del data
+                await asyncio.to_thread(self._extract_timetables, b64, zip_cache)
+            del b64
+        self._checkpoint(path, "decode")
+        with self._stage("decode"):
+            versions = await asyncio.to_thread(self._decode_versions, zip_cache, tables)
+        if self.keep_versions:
+            self.versions = versions
+        return self.current_version(versions)
+
+    def _is_fresh(self, zip_cache: str) -> bool:
+        # the extracted payload is reused like the cached tables,
+        # i.e. only with a cache backend, and for up to cache_ttl seconds
+        if not self.cache_backend or not isfile(zip_cache):
+            return False
+        return not self.cache_ttl or getmtime(zip_cache) + self.cache_ttl > time()
+
+    @staticmethod
+    def _extract_timetables(b64: str, zip_cache: str) -> None:
+        zip_data = b64decode(b64.encode())
+        # a parser cancelled while extracting must not leave a partial file
+        fd, tmp = mkstemp(dir=dirname(abspath(zip_cache)), suffix=".tmp")
+        try:
+            with ZipFile(BytesIO(zip_data), "r") as zf:
+                with zf.open("timetables.json") as src, open(fd, "wb") as dst:
+                    copyfileobj(src, dst)
+            replace(tmp, zip_cache)
+        except BaseException:
+            remove(tmp)
+            raise
+
+    def _decode_versions(
+        self, zip_cache: str, tables: List[str]
+    ) -> List[TimetableVersion]:
+        with open(zip_cache, "rb") as f:
+            timetables: dict = json.load(f)
+        return self._read_versions(timetables["timetables"], tables)
+
+    def _teacher_names_key(self) -> str:
+        return self._cache_key("teacher_names")
+
+    def _set_teacher_names(self, names: Dict[int, str]) -> None:
+        self.teacher_names = names
+        if self.memo is not None:
+            # the names change the parsed teachers, as much as the tables do
+            self.digests["teacher_names"] = digest(sorted(names.items()))
+
+    async def _load_teacher_names(self) -> None:
+        # read even when refreshing (as RefreshScheduler does), the names have
+        # their own TTL and are fetched again as soon as an unknown teacher appears
+        with self._stage("cache"):
+            names = await self.cache_backend.get(self._teacher_names_key())
+        if names:
+            # JSON object keys are strings
+            self._set_teacher_names({int(tid): name for tid, name in names.items()})
+
+    def _unknown_teachers(self) -> bool:
+        # also true if the names were not cached, or have expired
+        if not self.teacher_names:
+            return True
+        teachers = project("teachers", self.cache.get("teachers", []))
+        return any(teacher.id not in self.teacher_names for teacher in teachers)
+
+    async def _fetch_teacher_names(self, path: List[Union[str, List[str]]]) -> None:
+        version = await self._get_timetables_v1(path, ["teachers"], refresh=True)
+        # teachers missing in v1 keep their v2 names, so that they
+        # do not cause another fetch until the names expire
+        names = {
+            teacher.id: teacher.name
+            for teacher in project("teachers", self.cache.get("teachers", []))
+        }
+        for teacher in project("teachers", version.tables.get("teachers", [])):
+            names[teacher.id] = teacher.name
+        del version
+        self._set_teacher_names(names)
+        items = {str(tid): name for tid, name in names.items()}
+        with self._stage("cache"):
+            await self.cache_backend.put(
+                self._teacher_names_key(), items, ttl=self.teacher_names_ttl
             )
-            tid = teacher["UcitelID"].strip(ID_STRIP)
-            self.ds.get_teacher(name=name, internal_id=int(tid))
+
+    def _read_versions(
+        self, timetables: dict, tables: List[str]
+    ) -> List[TimetableVersion]:
+        # read every table of every timetable version in one pass
+        if self.keep_versions:
+            tables = list(dict.fromkeys(TABLES_V2_TIMETABLE + tables))
+        versions = []
+        seen: Dict[str, List[list]] = {}
+        for tid, timetable in timetables.items():
+            timetable: dict
+            dbi: dict = timetable["dbi"]
+            version_tables = {}
+            for table in tables:
+                if table not in dbi:
+                    continue
+                rows = dbi[table]
+                rows = list(rows.values()) if isinstance(rows, dict) else rows
+                # share the table with other versions if it is identical
+                shared = next((s for s in seen.get(table, []) if s == rows), None)
+                if shared is None:
+                    seen.setdefault(table, []).append(rows)
+                version_tables[table] = rows if shared is None else shared
+            version = TimetableVersion(
+                id=str(tid),
+                name=timetable.get("text", "").strip(),
+                date_from=timetable.get("datefrom") or None,
+                tables=version_tables,
+            )
+            versions.append(version)
+        # each version is valid until the next one starts
+        versions.sort(key=lambda v: v.date_from or date.min)
+        for version, following in zip(versions, versions[1:]):
+            if following.date_from:
+                version.date_to = following.date_from - timedelta(days=1)
+        return versions
+
+    @staticmethod
+    def current_version(
+        versions: List[TimetableVersion], day: date = None
+    ) -> TimetableVersion:
+        day = day or date.today()
+        return next((v for v in versions if v.is_valid(day)), versions[0])
+
+    async def parse_version(self, version: TimetableVersion):
+        """
+        Parse a single timetable version (from self.versions) into a new Dataset.
+        This does not perform any HTTP requests.
+        """
+        # no requests are made, but the transport is shared like any other
+        parser = EdupageParser(self.api_session, transport=self.api.transport)
+        async with parser:
+            parser.cache = dict(version.tables)
+            for table in TABLES_V2_TIMETABLE:
+                parser._enqueue_path(f"/parse/v2/{table}")
+            return await parser.run_all()
+
+    async def _parse_teachers_v1(self, teachers: list) -> None:
+        for teacher in project("ucitel", teachers):
+            teacher: TeacherRow
+            self.ds.get_teacher(name=teacher.name, internal_id=teacher.id)
+            self.occupancy["teachers"].add(teacher.id)
 
     async def _parse_periods_v2(self, periods: list) -> None:
-        for period in periods:
-            period: dict
-            pid = period["id"].strip(ID_STRIP)
-            self.periods[int(pid)] = period
+        for period in project("periods", periods):
+            period: PeriodRow
+            self.periods[period.id] = period
 
     async def _parse_classes_v2(self, classes: list) -> None:
-        for cls in classes:
-            cls: dict
-            name = cls["name"].strip()
-            cid = cls["id"].strip(ID_STRIP)
+        for cls in project("classes", classes):
+            cls: ClassRow
             self.ds.get_register(
-                type=Register.Type.CLASS, name=name, internal_id=int(cid)
+                type=Register.Type.CLASS, name=cls.name, internal_id=cls.id
             )
 
     async def _parse_groups_v2(self, groups: list) -> None:
-        for group in groups:
-            group: dict
-            rid = group["classid"].strip(ID_STRIP)
+        for group in project("groups", groups):
+            group: GroupRow
             register = self.ds.get_register(
-                type=Register.Type.CLASS, internal_id=int(rid)
+                type=Register.Type.CLASS, internal_id=group.classid
             )
-            if not group["entireclass"]:
-                name = register.name + " " + group["name"].strip()
+            if not group.entireclass:
+                name = register.name + " " + group.name
             else:
                 name = "-"
-            gid = group["id"].strip(ID_STRIP)
-            self.ds.get_team(register=register, name=name, internal_id=int(gid))
+            self.ds.get_team(register=register, name=name, internal_id=group.id)
 
     async def _parse_subjects_v2(self, subjects: list) -> None:
-        for subject in subjects:
-            subject: dict
-            name = subject["name"].strip()
-            sid = subject["id"].strip(ID_STRIP)
-            self.ds.get_subject(name=name, internal_id=int(sid))
+        for subject in project("subjects", subjects):
+            subject: SubjectRow
+            self.ds.get_subject(name=subject.name, internal_id=subject.id)
 
     async def _parse_teachers_v2(self, teachers: list) -> None:
-        for teacher in teachers:
-            teacher: dict
-            if "firstname" in teacher:
-                name = " ".join(
-                    [teacher["firstname"].strip(), teacher["lastname"].strip()]
-                )
-            else:
-                name = teacher["short"].strip()
-            tid = teacher["id"].strip("* ")
-            self.ds.get_teacher(name=name, internal_id=int(tid))
+        for teacher in project("teachers", teachers):
+            teacher: TeacherRow
+            name = self.teacher_names.get(teacher.id, teacher.name)
+            self.ds.get_teacher(name=name, internal_id=teacher.id)
+            self.occupancy["teachers"].add(teacher.id)
 
     async def _parse_classrooms_v2(self, classrooms: list) -> None:
-        for classroom in classrooms:
-            classroom: dict
-            name = classroom["name"].strip()
-            cid = classroom["id"].strip(ID_STRIP)
-            self.ds.get_classroom(name=name, internal_id=int(cid))
+        for classroom in project("classrooms", classrooms):
+            classroom: ClassroomRow
+            self.ds.get_classroom(name=classroom.name, internal_id=classroom.id)
+            self.occupancy["classrooms"].add(classroom.id)
 
     async def _parse_lessons_v2(self, lessons: list) -> None:
-        for lesson in lessons:
-            lesson: dict
-            # if len(lesson["groupids"]) != len(lesson["classids"]):
-            #     print(lesson)
-            lid = lesson["id"].strip(ID_STRIP)
-            lid = int(lid)
-            sid = lesson["subjectid"].strip(ID_STRIP)
-            sid = int(sid)
-            cid = lesson["classroomidss"][0][0] if lesson["classroomidss"] else None
-            cid = int(cid.strip(ID_STRIP)) if cid else None
+        for lesson in project("lessons", lessons):
+            lesson: LessonRow
+            cid = lesson.classroomid
             params = dict(
                 registers=[
-                    self.ds.get_register(
-                        type=Register.Type.CLASS, internal_id=int(cid.strip(ID_STRIP))
-                    )
-                    for cid in lesson["classids"]
+                    self.ds.get_register(type=Register.Type.CLASS, internal_id=rid)
+                    for rid in lesson.classids
                 ],
                 teams=[
-                    self.ds.get_team(
-                        register=None, internal_id=int(gid.strip(ID_STRIP))
-                    )
-                    for gid in lesson["groupids"]
+                    self.ds.get_team(register=None, internal_id=gid)
+                    for gid in lesson.groupids
                 ],
                 teachers=[
-                    self.ds.get_teacher(internal_id=int(tid.strip(ID_STRIP)))
-                    for tid in lesson["teacherids"]
+                    self.ds.get_teacher(internal_id=tid) for tid in lesson.teacherids
                 ],
-                subject=self.ds.get_subject(internal_id=sid),
+                subject=self.ds.get_subject(internal_id=lesson.subjectid),
                 classroom=self.ds.get_classroom(internal_id=cid) if cid else None,
             )
-            self.lessons[lid] = params
+            self.lessons[lesson.id] = params
 
     async def _parse_cards_v2(self, cards: list) -> None:
+        cards = project("cards", cards)
+        if self.vectorize:
+            await self._parse_cards_vectorized(cards)
+            return
+        rows = []
         for card in cards:
-            card: dict
-            cid = card["id"].strip(ID_STRIP)
-            cid = int(cid)
-            lid = card["lessonid"].strip(ID_STRIP)
-            lid = int(lid)
-            params = self.lessons[lid]
-
-            period_id = int(card["period"])
-            period = self.periods[period_id]
-
-            days = int(card["days"])
-            days = int(4 - log(days, 10))
+            card: CardRow
+            cid = card.id
+            params = self.lessons[card.lessonid]
+            period = self.periods[card.period]
+
+            days = int(4 - log(card.days, 10))
             weekday = WeekDay(days)
 
             params["weekday"] = weekday
-            params["number"] = int(period["period"])
-            params["time_start"] = datetime.strptime(
-                period["starttime"], "%H:%M"
-            ).time()
-            params["time_end"] = datetime.strptime(period["endtime"], "%H:%M").time()
+            params["number"] = period.period
+            params["time_start"] = datetime.strptime(period.starttime, "%H:%M").time()
+            params["time_end"] = datetime.strptime(period.endtime, "%H:%M").time()
+            self._occupy(params, weekday.value, params["number"])
 
             for team in params["teams"]:
                 team: Team
-                params["register_"] = team.register_
-                params["team"] = team if team.name != "-" else None
-                params["internal_id"] = cid * 10000 + team.internal_id
-                lesson = Lesson(**params)
-                # apparently, constructing a model makes a copy of all its properties
-                for k, v in params.items():
-                    if k in lesson.__fields__:
-                        lesson.__setattr__(k, v)
-                self.ds.lessons.append(lesson)
+                rows.append(
+                    dict(
+                        params,
+                        register_=team.register_,
+                        team=team if team.name != "-" else None,
+                        internal_id=cid * 10000 + team.internal_id,
+                    )
+                )
+
+        with self._stage("lessons"):
+            for params in rows:
+                self._build_lesson(params)
+            self.index.finish()
+
+    def _occupy(self, params: dict, weekday: int, number: int) -> None:
+        # lessons of a card share teachers and classroom, so occupy them once per card
+        for teacher in params["teachers"]:
+            self.occupancy["teachers"].occupy(teacher.internal_id, weekday, number)
+        if params["classroom"]:
+            classroom = params["classroom"].internal_id
+            self.occupancy["classrooms"].occupy(classroom, weekday, number)
+
+    async def _parse_cards_vectorized(self, cards: list) -> None:
+        self.columns = columns = vector.expand_cards(cards, self.lessons, self.periods)
+        # the first row of every card
+        _, rows = vector.np.unique(columns.card_id, return_index=True)
+        for lesson, weekday, number in zip(
+            columns.lesson[rows].tolist(),
+            columns.weekday[rows].tolist(),
+            columns.number[rows].tolist(),
+        ):
+            self._occupy(columns.lessons[lesson], weekday, number)
+        if not self.build_lessons:
+            return
+        with self._stage("lessons"):
+            self._build_lessons_vectorized(columns)
+            self.index.finish()
+
+    def _build_lessons_vectorized(self, columns: CardColumns) -> None:
+        rows = zip(
+            columns.internal_id.tolist(),
+            columns.lesson.tolist(),
+            columns.team.tolist(),
+            columns.period.tolist(),
+            columns.weekday.tolist(),
+            columns.number.tolist(),
+        )
+        for internal_id, lesson, team, period, weekday, number in rows:
+            team: Team = columns.teams[team]
+            time_start, time_end = columns.period_times[period]
+            params = dict(
+                columns.lessons[lesson],
+                weekday=WeekDay(weekday),
+                number=number,
+                time_start=time_start,
+                time_end=time_end,
+                register_=team.register_,
+                team=team if team.name != "-" else None,
+                internal_id=internal_id,
+            )
+            self._build_lesson(params)
+
+    def _build_lesson(self, params: dict) -> Lesson:
+        lesson = Lesson(**params)
+        # apparently, constructing a model makes a copy of all its properties
+        for k, v in params.items():
+            if k in lesson.__fields__:
+                lesson.__setattr__(k, v)
+        self.ds.lessons.append(lesson)
+        self.index.add(lesson)
+        return lesson
+
+    def close(self) -> None:
+        """
+        Release all data held by the parser, including the index and occupancy.
+        The Dataset returned by run_all() is not affected.
+        """
+        self._reset_state()
+
+    def _reset_state(self) -> None:
+        self.cache = {}
+        self.periods = {}
+        self.lessons = {}
+        self.columns = None
+        self.versions = []
+        self.digests = {}
+        self.memo_key = None
+        self.memo_hit = None
+        self.teacher_names = {}
+        self.index = LessonIndex()
+        self.occupancy = {"teachers": Occupancy(), "classrooms": Occupancy()}
 
     async def __aenter__(self) -> "EdupageParser":
+        if self.profiler:
+            self.profiler.start()
         await self.api.__aenter__()
-        if self.cache_file and isfile(self.cache_file):
-            with open(self.cache_file, "r") as f:
-                self.cache = json.load(f)
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
         await self.api.__aexit__(exc_type, exc_val, exc_tb)
-        if self.cache_file:
-            with open(self.cache_file, "w") as f:
-                json.dump(self.cache, f, indent=4)
+        if self.profiler:
+            self.profiler.stop()
+            self.profiler.write(self.profile_file)
+        self.close()
         return await self.session.close()
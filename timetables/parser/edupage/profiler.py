@@ -0,0 +1,102 @@
+import cProfile
+import io
+import pstats
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from time import perf_counter
+from typing import Iterator, List, NamedTuple
+
+
+class Stage(NamedTuple):
+    name: str
+    depth: int
+    duration: float
+    allocated: int
+    peak: int
+
+
+class Profiler:
+    """
+    CPU profile (cProfile) plus per-stage timing, allocation and
+    peak memory (tracemalloc) of a parser run.
+    """
+
+    def __init__(self, top: int = 40):
+        self.top = top
+        self.profile = cProfile.Profile()
+        self.stages: List[Stage] = []
+        self.running = False
+        self.started_at: datetime = None
+        self.duration = 0.0
+        self.peak = 0
+        # peak memory observed by each open stage, before its children reset it
+        self._peaks: List[int] = []
+
+    def start(self) -> None:
+        self.running = True
+        self.started_at = datetime.now()
+        self.duration = perf_counter()
+        tracemalloc.start()
+        self.profile.enable()
+
+    def stop(self) -> None:
+        if not self.running:
+            return
+        self.profile.disable()
+        self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        self.duration = perf_counter() - self.duration
+        self.running = False
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        if not self.running:
+            yield
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        if self._peaks:
+            self._peaks[-1] = max(self._peaks[-1], peak)
+        tracemalloc.reset_peak()
+        index = len(self.stages)
+        depth = len(self._peaks)
+        self._peaks.append(0)
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            duration = perf_counter() - start
+            after, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, self._peaks.pop())
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            self.peak = max(self.peak, peak)
+            # keep the stages in the order they were started
+            stage = Stage(name, depth, duration, after - current, peak)
+            self.stages.insert(index, stage)
+
+    def report(self) -> str:
+        lines = [
+            f"Profile started at {self.started_at}",
+            f"Total time: {self.duration * 1000:.1f} ms",
+            f"Peak memory: {self.peak / 1024:.1f} KiB",
+            "",
+            f"{'Stage':<50} {'Time [ms]':>12} {'Alloc [KiB]':>12} {'Peak [KiB]':>12}",
+        ]
+        for stage in self.stages:
+            name = "  " * stage.depth + stage.name
+            lines.append(
+                f"{name:<50} {stage.duration * 1000:>12.1f} "
+                f"{stage.allocated / 1024:>12.1f} {stage.peak / 1024:>12.1f}"
+            )
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+        lines += ["", stream.getvalue()]
+        return "\n".join(lines)
+
+    def write(self, path: str) -> None:
+        with open(path, "w") as f:
+            f.write(self.report())
+        # raw stats, for comparing runs with pstats/snakeviz
+        self.profile.dump_stats(f"{path}.prof")
@@ -0,0 +1,171 @@
+from dataclasses import dataclass, fields
+from typing import Dict, List, Optional, Tuple, Type
+
+from .api.const import ID_STRIP
+
+
+def _id(value: str) -> int:
+    return int(value.strip(ID_STRIP))
+
+
+def _ids(values: List[str]) -> Tuple[int, ...]:
+    return tuple(int(value.strip(ID_STRIP)) for value in values)
+
+
+@dataclass(slots=True)
+class PeriodRow:
+    id: int
+    period: int
+    starttime: str
+    endtime: str
+
+    @classmethod
+    def from_dict(cls, row: dict) -> "PeriodRow":
+        return cls(_id(row["id"]), int(row["period"]), row["starttime"], row["endtime"])
+
+
+@dataclass(slots=True)
+class ClassRow:
+    id: int
+    name: str
+
+    @classmethod
+    def from_dict(cls, row: dict) -> "ClassRow":
+        return cls(_id(row["id"]), row["name"].strip())
+
+
+@dataclass(slots=True)
+class GroupRow:
+    id: int
+    classid: int
+    name: str
+    entireclass: bool
+
+    @classmethod
+    def from_dict(cls, row: dict) -> "GroupRow":
+        return cls(
+            _id(row["id"]),
+            _id(row["classid"]),
+            row["name"].strip(),
+            bool(row["entireclass"]),
+        )
+
+
+@dataclass(slots=True)
+class SubjectRow:
+    id: int
+    name: str
+
+    @classmethod
+    def from_dict(cls, row: dict) -> "SubjectRow":
+        return cls(_id(row["id"]), row["name"].strip())
+
+
+@dataclass(slots=True)
+class TeacherRow:
+    id: int
+    name: str
+
+    @classmethod
+    def from_dict(cls, row: dict) -> "TeacherRow":
+        if "firstname" in row:
+            name = " ".join([row["firstname"].strip(), row["lastname"].strip()])
+        else:
+            name = row["short"].strip()
+        return cls(_id(row["id"]), name)
+
+    @classmethod
+    def from_dict_v1(cls, row: dict) -> "TeacherRow":
+        name = " ".join([row["p_priezvisko"].strip(), row["p_meno"].strip()])
+        return cls(_id(row["UcitelID"]), name)
+
+
+@dataclass(slots=True)
+class ClassroomRow:
+    id: int
+    name: str
+
+    @classmethod
+    def from_dict(cls, row: dict) -> "ClassroomRow":
+        return cls(_id(row["id"]), row["name"].strip())
+
+
+@dataclass(slots=True)
+class LessonRow:
+    id: int
+    subjectid: int
+    classroomid: Optional[int]
+    classids: Tuple[int, ...]
+    groupids: Tuple[int, ...]
+    teacherids: Tuple[int, ...]
+
+    @classmethod
+    def from_dict(cls, row: dict) -> "LessonRow":
+        # only the first classroom of the first card is used
+        classroomidss = row["classroomidss"]
+        cid = classroomidss[0][0] if classroomidss and classroomidss[0] else None
+        return cls(
+            _id(row["id"]),
+            _id(row["subjectid"]),
+            _id(cid) if cid else None,
+            _ids(row["classids"]),
+            _ids(row["groupids"]),
+            _ids(row["teacherids"]),
+        )
+
+
+@dataclass(slots=True)
+class CardRow:
+    id: int
+    lessonid: int
+    period: int
+    days: int
+
+    @classmethod
+    def from_dict(cls, row: dict) -> "CardRow":
+        return cls(
+            _id(row["id"]),
+            _id(row["lessonid"]),
+            int(row["period"]),
+            int(row["days"]),
+        )
+
+
+# table name -> row type
+ROWS: Dict[str, Type] = {
+    "periods": PeriodRow,
+    "classes": ClassRow,
+    "groups": GroupRow,
+    "subjects": SubjectRow,
+    "teachers": TeacherRow,
+    "classrooms": ClassroomRow,
+    "lessons": LessonRow,
+    "cards": CardRow,
+    "ucitel": TeacherRow,
+}
+
+
+def project(table: str, rows: list) -> list:
+    """
+    Convert the rows of a table to its row type, keeping only the fields
+    used by the parser. Accepts rows as dicts (as fetched from Edupage),
+    as lists (as stored by dump()), or already converted.
+    """
+    row_type = ROWS.get(table)
+    if row_type is None or not rows or isinstance(rows[0], row_type):
+        return rows
+    if isinstance(rows[0], dict):
+        if table == "ucitel":
+            return [row_type.from_dict_v1(row) for row in rows]
+        return [row_type.from_dict(row) for row in rows]
+    return [row_type(*row) for row in rows]
+
+
+def dump(rows: list) -> list:
+    """
+    Convert typed rows to JSON-serializable lists. Other rows are returned as-is.
+    """
+    if not rows or not hasattr(rows[0], "__slots__"):
+        return rows
+    names = [field.name for field in fields(rows[0])]
+    return [[getattr(row, name) for name in names] for row in rows]
@@ -0,0 +1,217 @@
+import asyncio
+import heapq
+import logging
+import random
+import time
+from itertools import count
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .api.const import TABLES_V1, TABLES_V2_TIMETABLE, TABLES_V2_V1
+from .api.limit import RateLimiter
+from .api.model import Session
+from .api.singleflight import SingleFlight
+from .api.transport import Transport
+from .cache import CacheBackend
+from .deadline import Deadline, RunResult
+from .memo import ParseMemo
+from .parser import EdupageParser
+
+log = logging.getLogger(__name__)
+
+
+class RefreshScheduler:
+    """
+    Keeps the data of many schools fresh, by re-parsing each school
+    shortly before any of its tables goes stale.
+
+    Every (school, table) pair is kept in a priority queue, keyed by its expiry
+    (the table's validity, see const.TABLES_V1). Refreshes are spread out with
+    random jitter, limited to `concurrency` parallel schools and a global budget
+    of `requests_per_minute` Edupage requests.
+    """
+
+    def __init__(
+        self,
+        sessions: Iterable[Session] = (),
+        on_refresh: Optional[Callable[[Session, RunResult], Awaitable[None]]] = None,
+        on_error: Optional[Callable[[Session, Exception], Awaitable[None]]] = None,
+        cache_backend: Optional[CacheBackend] = None,
+        requests_per_minute: float = 60.0,
+        concurrency: int = 4,
+        jitter: float = 0.1,
+        margin: float = 300.0,
+        min_interval: float = 6 * 3600.0,
+        retry_interval: float = 600.0,
+        initial_spread: float = 600.0,
+        transport: Optional[Transport] = None,
+        memo: Optional[ParseMemo] = None,
+        budget: Optional[float] = None,
+        **enqueue_kwargs,
+    ):
+        self.on_refresh = on_refresh
+        self.on_error = on_error
+        self.cache_backend = cache_backend
+        self.limiter = RateLimiter(requests_per_minute / 60.0, burst=concurrency)
+        self.jitter = jitter
+        self.margin = margin
+        self.min_interval = min_interval
+        self.retry_interval = retry_interval
+        self.initial_spread = initial_spread
+        self.transport = transport
+        # unchanged schools are not parsed again
+        self.memo = memo
+        # time budget of every refresh, see EdupageParser(deadline=)
+        self.budget = budget
+        self.enqueue_kwargs = enqueue_kwargs
+        self.sessions: Dict[str, Session] = {}
+        self.refreshed_at: Dict[str, float] = {}
+        self.failures: Dict[str, int] = {}
+        self._queue: List[Tuple[float, int, str, str]] = []
+        self._due: Dict[Tuple[str, str], float] = {}
+        self._seq = count()
+        self._running: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._slots = asyncio.Semaphore(concurrency)
+        # a forced refresh joins the school's refresh in flight, and vice versa
+        self.flights = SingleFlight()
+        self._wakeup = asyncio.Event()
+        for session in sessions:
+            self.add(session)
+
+    @property
+    def requests_per_refresh(self) -> int:
+        v1 = self.enqueue_kwargs.get("try_v1_teachers") or self.enqueue_kwargs.get(
+            "try_v1_full_teachers"
+        )
+        return 2 if v1 else 1
+
+    def validity(self, table: str) -> float:
+        return TABLES_V1.get(TABLES_V2_V1.get(table), 0) or self.min_interval
+
+    def _expiry(self, table: str, now: float) -> float:
+        validity = self.validity(table)
+        delay = validity - self.margin - random.uniform(0, validity * self.jitter)
+        return now + max(delay, validity / 2)
+
+    def _schedule(self, edupage: str, table: str, due: float) -> None:
+        self._due[(edupage, table)] = due
+        heapq.heappush(self._queue, (due, next(self._seq), edupage, table))
+        self._wakeup.set()
+
+    def _schedule_all(self, edupage: str, delay: float) -> None:
+        now = time.time()
+        for table in TABLES_V2_TIMETABLE:
+            self._schedule(edupage, table, now + delay)
+
+    def add(self, session: Session) -> None:
+        edupage = session.edupage_name()
+        self.sessions[edupage] = session
+        # spread out the initial refreshes
+        self._schedule_all(edupage, random.uniform(0, self.initial_spread))
+
+    def remove(self, edupage: str) -> None:
+        self.sessions.pop(edupage, None)
+        for table in TABLES_V2_TIMETABLE:
+            self._due.pop((edupage, table), None)
+
+    def next_due(self) -> Optional[Tuple[float, str, str]]:
+        for due, _, edupage, table in sorted(self._queue):
+            if self._due.get((edupage, table)) == due:
+                return due, edupage, table
+        return None
+
+    async def _refresh(self, edupage: str) -> RunResult:
+        session = self.sessions.get(edupage)
+        if not session:
+            self._running.discard(edupage)
+            raise KeyError(f"Unknown edupage: {edupage}")
+        self._running.add(edupage)
+        try:
+            await self.limiter.acquire(self.requests_per_refresh)
+            async with EdupageParser(
+                session,
+                cache_backend=self.cache_backend,
+                refresh=True,
+                transport=self.transport,
+                memo=self.memo,
+                deadline=Deadline(self.budget) if self.budget else None,
+            ) as parser:
+                parser.enqueue_all(**self.enqueue_kwargs)
+                ds = await parser.run_all()
+                result = RunResult(ds, tuple(parser.skipped))
+                if result.partial:
+                    log.warning(f"Refreshing '{edupage}' skipped {parser.skipped}")
+        except Exception as e:
+            failures = self.failures[edupage] = self.failures.get(edupage, 0) + 1
+            delay = min(self.retry_interval * 2 ** (failures - 1), self.min_interval)
+            log.warning(f"Refreshing '{edupage}' failed ({failures}x): {e!r}")
+            if edupage in self.sessions:
+                self._schedule_all(edupage, delay * random.uniform(1, 1 + self.jitter))
+            if self.on_error:
+                await self.on_error(session, e)
+            raise
+        finally:
+            self._running.discard(edupage)
+
+        now = time.time()
+        self.failures.pop(edupage, None)
+        self.refreshed_at[edupage] = now
+        if edupage in self.sessions:
+            for table in TABLES_V2_TIMETABLE:
+                self._schedule(edupage, table, self._expiry(table, now))
+        if self.on_refresh:
+            await self.on_refresh(session, result)
+        return result
+
+    async def _refresh_task(self, edupage: str) -> None:
+        try:
+            await self.flights.run(edupage, lambda: self._refresh(edupage))
+        except Exception:
+            pass
+        finally:
+            self._slots.release()
+
+    async def force_refresh(self, edupage: str) -> RunResult:
+        """
+        Refresh a school now, outside of its schedule, and return the new dataset.
+        If the school is being refreshed already, the result of that refresh
+        is returned instead.
+        """
+        async with self._slots:
+            return await self.flights.run(edupage, lambda: self._refresh(edupage))
+
+    async def run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            timeout = None
+            while self._queue:
+                due, _, edupage, table = self._queue[0]
+                if self._due.get((edupage, table)) != due:
+                    # superseded by a newer entry, or removed
+                    heapq.heappop(self._queue)
+                    continue
+                timeout = due - time.time()
+                break
+            if timeout is None or timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._queue)
+            del self._due[(edupage, table)]
+            if edupage in self._running:
+                # rescheduled when the running refresh completes
+                continue
+            # mark as running now, to skip the school's other due tables
+            self._running.add(edupage)
+            await self._slots.acquire()
+            task = asyncio.create_task(self._refresh_task(edupage))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,316 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict, defaultdict, deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+
+from aiohttp import web
+
+from .api import Portal, SessionExpiredError
+from .api.singleflight import SingleFlight
+from .api.transport import AdaptiveTransport, AiohttpTransport, Transport
+from .cache import CacheBackend
+from .export import lesson_dict
+from .feeds import FeedCache
+from .index import LessonIndex
+from .memo import ParseMemo
+from .parser import EdupageParser
+
+log = logging.getLogger(__name__)
+
+# URL name -> LessonIndex attribute
+ENTITIES = {
+    "classes": "registers",
+    "teachers": "teachers",
+    "classrooms": "classrooms",
+}
+# URL name -> FeedCache kind
+FEEDS = dict(ENTITIES, teams="teams")
+
+
+class SchoolData:
+    """
+    Parsed lessons of a school, grouped by class, teacher and classroom.
+    The lesson dicts are shared with the school's feeds.
+    """
+
+    def __init__(self, edupage: str, index: LessonIndex, feeds: FeedCache):
+        self.edupage = edupage
+        self.feeds = feeds
+        self.loaded_at = time.time()
+        self.lessons = [lesson_dict(lesson) for lesson in index.lessons]
+        dicts = {id(lesson): d for lesson, d in zip(index.lessons, self.lessons)}
+        self.entities: Dict[str, Dict[str, List[dict]]] = {}
+        for kind, attr in ENTITIES.items():
+            lessons = getattr(index, attr)
+            self.entities[kind] = {
+                name: [dicts[id(lesson)] for lesson in lessons[internal_id]]
+                for name, internal_id in index.names[attr].items()
+            }
+        # approximate, the grouped lists only hold references
+        self.lessons_size = len(json.dumps(self.lessons))
+
+    @property
+    def size(self) -> int:
+        # rendered feeds are added on demand
+        return self.lessons_size + self.feeds.size
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.loaded_at
+
+
+class DatasetStore:
+    """
+    Keeps parsed schools in memory, evicting the least recently used ones
+    when their total size exceeds `max_memory` bytes.
+
+    Data older than `fresh_for` seconds is still served (for up to `max_stale`
+    more seconds), while the school is re-parsed in the background.
+    """
+
+    def __init__(
+        self,
+        portal: Portal,
+        max_memory: int = 256 * 1024 * 1024,
+        fresh_for: float = 3600.0,
+        max_stale: float = 86400.0,
+        cache_backend: Optional[CacheBackend] = None,
+        transport: Optional[Transport] = None,
+        memo: Optional[ParseMemo] = None,
+        **enqueue_kwargs,
+    ):
+        self.portal = portal
+        self.max_memory = max_memory
+        self.fresh_for = fresh_for
+        self.max_stale = max_stale
+        self.cache_backend = cache_backend
+        # shared by all parsers, so that connections are reused between schools;
+        # closed with the store
+        if transport is None:
+            transport = AiohttpTransport()
+        self.transport = transport
+        self.memo = memo
+        self.enqueue_kwargs = enqueue_kwargs
+        self.entries: OrderedDict[str, SchoolData] = OrderedDict()
+        # rendered feeds are kept across reloads, see FeedCache.update()
+        self.feeds: Dict[str, FeedCache] = {}
+        self.flights = SingleFlight()
+        self._refreshing: Dict[str, asyncio.Task] = {}
+
+    def has_school(self, edupage: str) -> bool:
+        return any(str(s.edupage) == edupage for s in self.portal.sessions)
+
+    @property
+    def size(self) -> int:
+        return sum(data.size for data in self.entries.values())
+
+    def trim(self) -> None:
+        """
+        Evict the least recently used schools, until their total size
+        fits `max_memory`. Called when a school is loaded, or its feeds grow.
+        """
+        size = self.size
+        while size > self.max_memory and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            size -= evicted.size
+            self.feeds.pop(evicted.edupage, None)
+
+    def _put(self, data: SchoolData) -> None:
+        self.entries.pop(data.edupage, None)
+        self.entries[data.edupage] = data
+        self.trim()
+
+    async def _load(self, edupage: str, refresh: bool) -> SchoolData:
+        session = self.portal.get_session(edupage)
+        async with EdupageParser(
+            session,
+            cache_backend=self.cache_backend,
+            refresh=refresh,
+            transport=self.transport,
+            memo=self.memo,
+        ) as parser:
+            parser.enqueue_all(**self.enqueue_kwargs)
+            await parser.run_all()
+            feeds = self.feeds.get(edupage)
+            if feeds is None:
+                feeds = self.feeds[edupage] = FeedCache(edupage)
+            data = SchoolData(edupage, parser.index, feeds)
+            changed = feeds.update(parser.index, data.lessons)
+            log.debug(f"Feeds of {changed} entities of '{edupage}' changed")
+        self._put(data)
+        return data
+
+    def _revalidate(self, edupage: str) -> None:
+        if edupage in self._refreshing:
+            return
+
+        def done(task: asyncio.Task) -> None:
+            self._refreshing.pop(edupage, None)
+            if not task.cancelled() and task.exception():
+                log.warning(f"Refreshing '{edupage}' failed: {task.exception()!r}")
+
+        task = asyncio.create_task(
+            self.flights.run(edupage, lambda: self._load(edupage, refresh=True))
+        )
+        task.add_done_callback(done)
+        self._refreshing[edupage] = task
+
+    async def get(self, edupage: str) -> SchoolData:
+        data = self.entries.get(edupage)
+        if data:
+            self.entries.move_to_end(edupage)
+            if data.age < self.fresh_for:
+                return data
+            if data.age < self.fresh_for + self.max_stale:
+                self._revalidate(edupage)
+                return data
+        refresh = data is not None
+        return await self.flights.run(
+            edupage, lambda: self._load(edupage, refresh=refresh)
+        )
+
+    async def close(self) -> None:
+        for task in self._refreshing.values():
+            task.cancel()
+        await asyncio.gather(*self._refreshing.values(), return_exceptions=True)
+        await self.transport.close()
+
+
+class LatencyStats:
+    """
+    Request latency percentiles of the most recent `window` requests, per route.
+    """
+
+    def __init__(self, window: int = 1000):
+        self.counts: Dict[str, int] = defaultdict(int)
+        self.samples: Dict[str, Deque[float]] = defaultdict(
+            lambda: deque(maxlen=window)
+        )
+
+    def add(self, route: str, duration: float) -> None:
+        self.counts[route] += 1
+        self.samples[route].append(duration)
+
+    def summary(self) -> Dict[str, dict]:
+        result = {}
+        for route, samples in self.samples.items():
+            samples = sorted(samples)
+            result[route] = dict(count=self.counts[route], max_ms=samples[-1] * 1000)
+            for p in (50, 90, 99):
+                index = min(len(samples) - 1, len(samples) * p // 100)
+                result[route][f"p{p}_ms"] = samples[index] * 1000
+        return result
+
+
+class TimetableServer:
+    def __init__(self, store: DatasetStore):
+        self.store = store
+        self.stats = LatencyStats()
+        self.app = web.Application(middlewares=[self._measure])
+        self.app.add_routes(
+            [
+                web.get("/metrics", self.metrics),
+                web.get("/{edupage}", self.school),
+                web.get("/{edupage}/{kind}", self.entities),
+                web.get("/{edupage}/{kind}/{name}.{format:ics|json}", self.feed),
+                web.get("/{edupage}/{kind}/{name}", self.entity),
+            ]
+        )
+        self.app.on_cleanup.append(lambda _: self.store.close())
+
+    @web.middleware
+    async def _measure(self, request: web.Request, handler) -> web.StreamResponse:
+        start = time.perf_counter()
+        try:
+            return await handler(request)
+        finally:
+            resource = request.match_info.route.resource
+            route = resource.canonical if resource else "unmatched"
+            self.stats.add(route, time.perf_counter() - start)
+
+    async def _get(self, request: web.Request) -> SchoolData:
+        edupage = request.match_info["edupage"]
+        if not self.store.has_school(edupage):
+            raise web.HTTPNotFound(text=f"Unknown edupage '{edupage}'")
+        try:
+            return await self.store.get(edupage)
+        except SessionExpiredError as e:
+            raise web.HTTPBadGateway(text=str(e))
+
+    @staticmethod
+    def _kind(request: web.Request) -> str:
+        kind = request.match_info["kind"]
+        if kind not in ENTITIES:
+            raise web.HTTPNotFound(text=f"Unknown entity type '{kind}'")
+        return kind
+
+    async def metrics(self, request: web.Request) -> web.Response:
+        metrics = {
+            "schools": len(self.store.entries),
+            "memory": self.store.size,
+            "latency": self.stats.summary(),
+        }
+        if isinstance(self.store.transport, AdaptiveTransport):
+            metrics["upstream"] = self.store.transport.stats()
+        feeds = [feeds.stats() for feeds in self.store.feeds.values()]
+        metrics["feeds"] = {
+            key: sum(stats[key] for stats in feeds)
+            for key in ("feeds", "bytes", "renders", "hits")
+        }
+        return web.json_response(metrics)
+
+    async def school(self, request: web.Request) -> web.Response:
+        data = await self._get(request)
+        return web.json_response(
+            {
+                "edupage": data.edupage,
+                "updated": datetime.fromtimestamp(data.loaded_at).isoformat(),
+                "lessons": data.lessons,
+            }
+        )
+
+    async def entities(self, request: web.Request) -> web.Response:
+        kind = self._kind(request)
+        data = await self._get(request)
+        return web.json_response(sorted(data.entities[kind]))
+
+    async def entity(self, request: web.Request) -> web.Response:
+        kind = self._kind(request)
+        name = request.match_info["name"]
+        data = await self._get(request)
+        if name not in data.entities[kind]:
+            raise web.HTTPNotFound(text=f"'{name}' not found in {kind}")
+        return web.json_response(data.entities[kind][name])
+
+    async def feed(self, request: web.Request) -> web.Response:
+        kind = request.match_info["kind"]
+        if kind not in FEEDS:
+            raise web.HTTPNotFound(text=f"Unknown entity type '{kind}'")
+        name = request.match_info["name"]
+        data = await self._get(request)
+        renders = data.feeds.renders
+        feed = data.feeds.get(FEEDS[kind], name, request.match_info["format"])
+        if feed is None:
+            raise web.HTTPNotFound(text=f"'{name}' not found in {kind}")
+        if data.feeds.renders != renders:
+            # the rendered feed counts towards the memory limit
+            self.store.trim()
+        headers = {"ETag": feed.etag}
+        etags = request.headers.get("If-None-Match", "").split(",")
+        etags = {etag.strip().removeprefix("W/") for etag in etags}
+        if feed.etag in etags or "*" in etags:
+            raise web.HTTPNotModified(headers=headers)
+        return web.Response(
+            body=feed.body,
+            content_type=feed.content_type,
+            charset="utf-8",
+            headers=headers,
+        )
+
+
+def run_server(portal: Portal, host: str = "127.0.0.1", port: int = 8080, **kwargs):
+    server = TimetableServer(DatasetStore(portal, **kwargs))
+    web.run_app(server.app, host=host, port=port)
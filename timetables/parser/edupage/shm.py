@@ -0,0 +1,304 @@
+import mmap
+import os
+import struct
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from timetables.schemas import Lesson
+
+from .export import _name, _time
+
+# shared memory on Linux, a regular directory elsewhere
+DEFAULT_DIRECTORY = (
+    "/dev/shm/edupage"
+    if os.path.isdir("/dev/shm")
+    else os.path.join(tempfile.gettempdir(), "edupage")
+)
+
+MAGIC = b"EDPL"
+FORMAT = 1
+NONE = 0xFFFFFFFF
+
+# magic, format, published at, lessons, strings, teacher references
+HEADER = struct.Struct("<4sIdIII")
+# id, weekday, number, teacher count, then string indexes: time start, time end,
+# register, team, subject, classroom, and the index of the first teacher reference
+RECORD = struct.Struct("<qBBHIIIIIII")
+UINT = struct.Struct("<I")
+# LessonView fields, by which lessons can be grouped
+GROUPS = ("register", "teachers", "classroom")
+# DatasetReader attempts to open the current version of a school
+RETRIES = 3
+
+
+class _Strings:
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+
+    def add(self, value: Optional[str]) -> int:
+        if value is None:
+            return NONE
+        if value not in self.index:
+            self.index[value] = len(self.index)
+        return self.index[value]
+
+    def pack(self) -> Tuple[bytes, bytes]:
+        data = [value.encode() for value in self.index]
+        offsets = [0]
+        for value in data:
+            offsets.append(offsets[-1] + len(value))
+        return struct.pack(f"<{len(offsets)}I", *offsets), b"".join(data)
+
+
+def pack_lessons(lessons: Iterable[Lesson], published_at: float) -> bytes:
+    """
+    Pack lessons into the compact layout read by DatasetView: fixed-size
+    records referencing a deduplicated string table.
+    """
+    strings = _Strings()
+    records = []
+    teachers: List[int] = []
+    for lesson in lessons:
+        records.append(
+            RECORD.pack(
+                lesson.internal_id,
+                lesson.weekday.value,
+                lesson.number,
+                len(lesson.teachers),
+                strings.add(_time(lesson.time_start)),
+                strings.add(_time(lesson.time_end)),
+                strings.add(_name(lesson.register_)),
+                strings.add(_name(lesson.team)),
+                strings.add(_name(lesson.subject)),
+                strings.add(_name(lesson.classroom)),
+                len(teachers),
+            )
+        )
+        teachers += [strings.add(teacher.name) for teacher in lesson.teachers]
+    offsets, data = strings.pack()
+    header = HEADER.pack(
+        MAGIC, FORMAT, published_at, len(records), len(strings.index), len(teachers)
+    )
+    return b"".join(
+        [
+            header,
+            *records,
+            struct.pack(f"<{len(teachers)}I", *teachers),
+            offsets,
+            data,
+        ]
+    )
+
+
+class DatasetPublisher:
+    """
+    Publishes parsed schools to files in `directory` (shared memory by default),
+    to be mapped by DatasetReaders in other processes.
+
+    Every publish writes a new version file, then atomically replaces
+    the school's pointer file. Readers switch to the new version on their
+    next access; views of older versions stay valid while referenced.
+    Only the `keep` most recent versions are kept on disk.
+    """
+
+    def __init__(self, directory: str = DEFAULT_DIRECTORY, keep: int = 2):
+        self.directory = directory
+        self.keep = keep
+        os.makedirs(directory, exist_ok=True)
+
+    def _versions(self, edupage: str) -> List[str]:
+        prefix = f"{edupage}."
+        return sorted(
+            name
+            for name in os.listdir(self.directory)
+            if name.startswith(prefix) and name.endswith(".bin")
+        )
+
+    def publish(self, edupage: str, lessons: Iterable[Lesson]) -> str:
+        published_at = time.time()
+        name = f"{edupage}.{time.time_ns():020d}.bin"
+        path = os.path.join(self.directory, name)
+        with open(path, "wb") as f:
+            f.write(pack_lessons(lessons, published_at))
+        pointer = os.path.join(self.directory, f"{edupage}.current")
+        # a unique name, as other threads or processes may publish the same school
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            # mkstemp() creates files readable only by their owner
+            os.fchmod(fd, 0o644)
+            with os.fdopen(fd, "w") as f:
+                f.write(name)
+            os.replace(tmp, pointer)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        for old in self._versions(edupage)[: -self.keep]:
+            try:
+                # mappings of removed files stay valid (on POSIX systems)
+                os.remove(os.path.join(self.directory, old))
+            except OSError:
+                pass
+        return path
+
+
+class LessonView:
+    """
+    A lesson read from a DatasetView, with the same fields as export.lesson_dict().
+    Fields are decoded on access.
+    """
+
+    __slots__ = ("_dataset", "_record")
+
+    def __init__(self, dataset: "DatasetView", record: tuple):
+        self._dataset = dataset
+        self._record = record
+
+    id = property(lambda self: self._record[0])
+    weekday = property(lambda self: self._record[1])
+    number = property(lambda self: self._record[2])
+    time_start = property(lambda self: self._dataset.string(self._record[4]))
+    time_end = property(lambda self: self._dataset.string(self._record[5]))
+    register = property(lambda self: self._dataset.string(self._record[6]))
+    team = property(lambda self: self._dataset.string(self._record[7]))
+    subject = property(lambda self: self._dataset.string(self._record[8]))
+    classroom = property(lambda self: self._dataset.string(self._record[9]))
+
+    @property
+    def teachers(self) -> List[str]:
+        count, first = self._record[3], self._record[10]
+        return [self._dataset.teacher(i) for i in range(first, first + count)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "weekday": self.weekday,
+            "number": self.number,
+            "time_start": self.time_start,
+            "time_end": self.time_end,
+            "register": self.register,
+            "team": self.team,
+            "subject": self.subject,
+            "teachers": self.teachers,
+            "classroom": self.classroom,
+        }
+
+    def __repr__(self) -> str:
+        return f"LessonView({self.to_dict()!r})"
+
+
+class DatasetView:
+    """
+    Lessons of a school version, read directly from a memory-mapped file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, fmt, self.published_at, count, strings, teachers = HEADER.unpack_from(
+            self._mmap
+        )
+        if magic != MAGIC or fmt != FORMAT:
+            raise ValueError(f"Not a dataset file: {path}")
+        self.count = count
+        self._records = HEADER.size
+        self._teachers = self._records + count * RECORD.size
+        self._offsets = self._teachers + teachers * UINT.size
+        self._data = self._offsets + (strings + 1) * UINT.size
+        self._strings: Dict[int, str] = {}
+        self._groups: Optional[Dict[str, Dict[str, List[int]]]] = None
+
+    def string(self, index: int) -> Optional[str]:
+        if index == NONE:
+            return None
+        value = self._strings.get(index)
+        if value is None:
+            start, end = struct.unpack_from(
+                "<2I", self._mmap, self._offsets + index * 4
+            )
+            value = str(self._mmap[self._data + start : self._data + end], "utf-8")
+            self._strings[index] = value
+        return value
+
+    def teacher(self, index: int) -> str:
+        return self.string(UINT.unpack_from(self._mmap, self._teachers + index * 4)[0])
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: int) -> LessonView:
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        offset = self._records + index * RECORD.size
+        return LessonView(self, RECORD.unpack_from(self._mmap, offset))
+
+    def __iter__(self) -> Iterator[LessonView]:
+        return (self[i] for i in range(self.count))
+
+    def _group(self, kind: str) -> Dict[str, List[int]]:
+        if self._groups is None:
+            groups = {kind: defaultdict(list) for kind in GROUPS}
+            for i, lesson in enumerate(self):
+                groups["register"][lesson.register].append(i)
+                groups["classroom"][lesson.classroom].append(i)
+                for teacher in lesson.teachers:
+                    groups["teachers"][teacher].append(i)
+            self._groups = {kind: dict(group) for kind, group in groups.items()}
+        return self._groups[kind]
+
+    def names(self, kind: str) -> List[str]:
+        """
+        Names of registers, teachers or classrooms (kind: "register",
+        "teachers" or "classroom").
+        """
+        return sorted(name for name in self._group(kind) if name is not None)
+
+    def lessons(self, kind: str, name: str) -> List[LessonView]:
+        return [self[i] for i in self._group(kind).get(name, [])]
+
+
+class DatasetReader:
+    """
+    Reads schools published by a DatasetPublisher, switching to a new version
+    as soon as it is published. Checking for a new version costs a single stat().
+    """
+
+    def __init__(self, directory: str = DEFAULT_DIRECTORY):
+        self.directory = directory
+        self.views: Dict[str, Tuple[Tuple[int, int], DatasetView]] = {}
+
+    def edupages(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            name[: -len(".current")]
+            for name in os.listdir(self.directory)
+            if name.endswith(".current")
+        )
+
+    def get(self, edupage: str) -> Optional[DatasetView]:
+        pointer = os.path.join(self.directory, f"{edupage}.current")
+        for attempt in range(RETRIES):
+            try:
+                stat = os.stat(pointer)
+            except FileNotFoundError:
+                self.views.pop(edupage, None)
+                return None
+            key = (stat.st_ino, stat.st_mtime_ns)
+            cached = self.views.get(edupage)
+            if cached and cached[0] == key:
+                return cached[1]
+            try:
+                with open(pointer, "r") as f:
+                    name = f.read().strip()
+                view = DatasetView(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                # the version was removed by a publisher after reading
+                # the pointer, which then points to a newer one
+                if attempt == RETRIES - 1:
+                    raise
+                continue
+            self.views[edupage] = (key, view)
+            return view
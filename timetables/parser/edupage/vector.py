@@ -0,0 +1,124 @@
+from datetime import datetime, time
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+from timetables.schemas import Team
+
+from .rows import CardRow, PeriodRow
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class CardColumns(NamedTuple):
+    """
+    Cards expanded to one row per (card, team), stored as parallel arrays.
+
+    The ``lesson``, ``team`` and ``period`` arrays are indexes into
+    the ``lesson_ids``, ``teams`` and ``period_ids`` lookup lists.
+    ``lessons`` holds the registers, teams, teachers, subject and classroom
+    of every lesson in ``lesson_ids``.
+    """
+
+    internal_id: "np.ndarray"
+    card_id: "np.ndarray"
+    lesson: "np.ndarray"
+    team: "np.ndarray"
+    period: "np.ndarray"
+    weekday: "np.ndarray"
+    number: "np.ndarray"
+    lesson_ids: List[int]
+    lessons: List[dict]
+    teams: List[Team]
+    period_ids: List[int]
+    period_times: List[Tuple[time, time]]
+
+
+def is_available() -> bool:
+    return np is not None
+
+
+def _ints(values: Iterable[int], count: int) -> "np.ndarray":
+    return np.fromiter(values, dtype=np.int64, count=count)
+
+
+def _lookup(keys: "np.ndarray", values: "np.ndarray", what: str) -> "np.ndarray":
+    # keys must be sorted; raise like a dict would for missing values
+    index = np.searchsorted(keys, values)
+    if len(keys):
+        index[index >= len(keys)] = 0
+        missing = keys[index] != values
+    else:
+        missing = np.ones(len(values), dtype=bool)
+    if missing.any():
+        raise KeyError(f"Unknown {what} ID: {values[missing][0]}")
+    return index
+
+
+def expand_cards(
+    cards: List[CardRow],
+    lessons: Dict[int, dict],
+    periods: Dict[int, PeriodRow],
+) -> CardColumns:
+    if np is None:
+        raise RuntimeError("Vectorized card parsing requires numpy")
+
+    # lookup tables, sorted by ID
+    lesson_ids = sorted(lessons)
+    period_ids = sorted(periods)
+    teams: List[Team] = []
+    team_counts = np.empty(len(lesson_ids), dtype=np.int64)
+    for i, lid in enumerate(lesson_ids):
+        lesson_teams = lessons[lid]["teams"]
+        teams += lesson_teams
+        team_counts[i] = len(lesson_teams)
+    team_offsets = np.cumsum(team_counts) - team_counts
+    team_ids = np.fromiter(
+        (team.internal_id for team in teams), dtype=np.int64, count=len(teams)
+    )
+    period_numbers = _ints((periods[pid].period for pid in period_ids), len(periods))
+    period_times = [
+        (
+            datetime.strptime(periods[pid].starttime, "%H:%M").time(),
+            datetime.strptime(periods[pid].endtime, "%H:%M").time(),
+        )
+        for pid in period_ids
+    ]
+
+    # decode the card table
+    count = len(cards)
+    card_ids = _ints((card.id for card in cards), count)
+    card_lessons = _lookup(
+        np.asarray(lesson_ids, dtype=np.int64),
+        _ints((card.lessonid for card in cards), count),
+        what="lesson",
+    )
+    card_periods = _lookup(
+        np.asarray(period_ids, dtype=np.int64),
+        _ints((card.period for card in cards), count),
+        what="period",
+    )
+    days = _ints((card.days for card in cards), count)
+    card_weekdays = (4 - np.rint(np.log10(days))).astype(np.int64)
+
+    # fan out every card to all teams of its lesson
+    counts = team_counts[card_lessons]
+    rows = np.repeat(np.arange(len(cards)), counts)
+    row_starts = np.repeat(np.cumsum(counts) - counts, counts)
+    team_index = team_offsets[card_lessons][rows] + np.arange(len(rows)) - row_starts
+
+    return CardColumns(
+        internal_id=card_ids[rows] * 10000 + team_ids[team_index],
+        card_id=card_ids[rows],
+        lesson=card_lessons[rows],
+        team=team_index,
+        period=card_periods[rows],
+        weekday=card_weekdays[rows],
+        number=period_numbers[card_periods[rows]],
+        lesson_ids=lesson_ids,
+        lessons=[lessons[lid] for lid in lesson_ids],
+        teams=teams,
+        period_ids=period_ids,
+        period_times=period_times,
+    )